@@ -0,0 +1,111 @@
+"""Interactive shell startup benchmark, per init stage.
+
+Times each stage of the `.bashrc`/`.zshrc` written by `setup-unix.sh` in a fresh shell, the way it used to run (forking
+`starship init`, `zoxide init` and `ssh-agent`, sourcing every bash completion) and from the cache written by
+`scripts/shell-init.sh`, plus the full startup of the shells with the current rc files:
+
+    python benchmarks/shell.py                 # bash and zsh, whichever are installed
+    python benchmarks/shell.py --shell bash --runs 50
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# ------------------------------------------------------------------------------
+# Stages
+# ------------------------------------------------------------------------------
+LIVE: dict[str, str] = {
+    "alias.sh":    f"source {ROOT / 'scripts' / 'alias.sh'}",
+    "starship":    'eval "$(starship init {shell})"',
+    "zoxide":      'eval "$(zoxide init {shell})"',
+    "completions": 'for COMPLETION in "$(brew --prefix)/etc/bash_completion.d/"*; do source "$COMPLETION"; done',
+    "ssh-agent":   'eval "$(ssh-agent -s)" >/dev/null; echo "agent $SSH_AGENT_PID"',
+}
+"""Stage → snippet run by every new shell before the cache; `{shell}` is the shell being measured."""
+
+TOOLS: dict[str, str] = {"starship": "starship", "zoxide": "zoxide", "completions": "brew", "ssh-agent": "ssh-agent"}
+"""Stage → command it needs; stages without it are skipped."""
+
+def cached_stages(shell: str, directory: Path, agent_env: Path | None) -> dict[str, str]:
+    """Stage → snippet sourcing its part of the cache, generated into `directory` by `shell-init.sh`."""
+    subprocess.run(["bash", str(ROOT / "scripts" / "shell-init.sh"), shell], env={**os.environ, "SHELL_INIT_CACHE": str(directory)}, check=True)
+    init = (directory / f"init.{shell}").read_text()
+    header, *parts = init.split("# stage: ")
+    stages = {"alias.sh": LIVE["alias.sh"], "guard": _stage_file(directory, "guard", header + "return 0\n")}
+    for part in parts:
+        name = part.split("\n", 1)[0]
+        stages[name] = _stage_file(directory, name, part.split("\n", 1)[1])
+    if agent_env is not None:
+        stages["ssh-agent"] = f'source {agent_env} >/dev/null; kill -0 "$SSH_AGENT_PID"'
+    return stages
+
+def _stage_file(directory: Path, name: str, content: str) -> str:
+    path = directory / f"stage-{name}"
+    path.write_text(content)
+    return f"source {path}"
+
+# ------------------------------------------------------------------------------
+# Measure
+# ------------------------------------------------------------------------------
+def measure(args: list[str], runs: int) -> float:
+    """Median wall time (ms) of `runs` fresh shells."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        times.append((time.perf_counter() - start) * 1000)
+        # agents started by the live ssh-agent stage would outlive the shell, so it prints their pid
+        for line in result.stdout.splitlines():
+            if line.startswith("agent "):
+                subprocess.run(["kill", line.split()[1]], stderr=subprocess.DEVNULL)
+    return statistics.median(times)
+
+def measure_stage(shell: str, snippet: str, runs: int, baseline: float) -> float:
+    """Time a stage adds to a shell started without rc files."""
+    norc = ["bash", "--norc", "--noprofile"] if shell == "bash" else ["zsh", "-f"]
+    return measure([*norc, "-c", snippet], runs) - baseline
+
+def start_agent(directory: Path) -> tuple[Path, str] | None:
+    """A running ssh-agent and the env file shells reuse it from, or None without ssh-agent."""
+    if shutil.which("ssh-agent") is None:
+        return None
+    env = directory / "agent.env"
+    env.write_text(subprocess.run(["ssh-agent", "-s"], capture_output=True, text=True, check=True).stdout)
+    pid = next(line.split("=")[1].split(";")[0] for line in env.read_text().splitlines() if line.startswith("SSH_AGENT_PID="))
+    return env, pid
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark interactive shell startup per init stage, live vs cached.")
+    parser.add_argument("--shell", choices=["bash", "zsh"], action="append", help="shell to measure (default: bash and zsh, if installed)")
+    parser.add_argument("--runs", type=int, default=20, help="shells started per measurement (default: 20)")
+    args = parser.parse_args()
+
+    for shell in args.shell or [shell for shell in ("bash", "zsh") if shutil.which(shell)]:
+        with tempfile.TemporaryDirectory() as directory:
+            agent = start_agent(Path(directory))
+            try:
+                cached = cached_stages(shell, Path(directory), agent[0] if agent else None)
+                baseline = measure_stage(shell, ":", args.runs, 0.0)
+                print(f"{shell + ' stage':<16}  {'live ms':>8}  {'cached ms':>9}")
+                for name in dict.fromkeys([*LIVE, *cached]):
+                    if name in TOOLS and shutil.which(TOOLS[name]) is None or name == "completions" and shell != "bash":
+                        continue
+                    live = f"{measure_stage(shell, LIVE[name].format(shell=shell), args.runs, baseline):8.1f}" if name in LIVE else ""
+                    cache = f"{measure_stage(shell, cached[name], args.runs, baseline):9.1f}" if name in cached else ""
+                    print(f"{name:<16}  {live:>8}  {cache:>9}")
+                print(f"{'interpreter':<16}  {baseline:8.1f}")
+                print(f"{'full (-i)':<16}  {measure([shell, '-i', '-c', 'exit'], args.runs):8.1f}  (current rc files)")
+                print("")
+            finally:
+                if agent:
+                    subprocess.run(["kill", agent[1]], stderr=subprocess.DEVNULL)
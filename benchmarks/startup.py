@@ -0,0 +1,123 @@
+"""Startup benchmark for dotfiles.py and the vendored UI stack.
+
+Measures cold (empty bytecode cache) and warm startup of a few entry points, plus the per-module import cost of the
+interactive startup path, and writes the results as JSON so runs on different commits can be compared:
+
+    python benchmarks/startup.py                       # writes benchmarks/results/<commit>.json
+    python benchmarks/startup.py --compare base.json   # also prints the delta against a previous run
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from dotfiles import profile_imports
+
+# ------------------------------------------------------------------------------
+# Cases
+# ------------------------------------------------------------------------------
+PRELUDE = "import sys; sys.path.insert(0, 'vendor'); "
+
+CASES: dict[str, list[str]] = {
+    "interpreter":   ["-c", "pass"],
+    "dotfiles":      ["-c", PRELUDE + "import dotfiles"],
+    "dotfiles_tui":  ["-c", PRELUDE + "import dotfiles_tui"],
+    "prompt_toolkit": ["-c", PRELUDE + "import prompt_toolkit.application"],
+    "wcwidth":       ["-c", PRELUDE + "import wcwidth; wcwidth.wcswidth('warm up the tables 漢字')"],
+    "cli dry-run":   ["dotfiles.py", "backup", "--all", "--dry-run"],
+}
+"""Name → interpreter arguments of each measured entry point, run from the repo root."""
+
+# ------------------------------------------------------------------------------
+# Measure
+# ------------------------------------------------------------------------------
+def measure(args: list[str], runs: int, cold: bool) -> list[float]:
+    """Wall times (ms) of `runs` fresh interpreters. Cold runs get an empty bytecode cache each time."""
+    times = []
+    with tempfile.TemporaryDirectory() as cache:
+        env = {**os.environ, "PYTHONPYCACHEPREFIX": cache}
+        for _ in range(runs):
+            if cold:
+                env["PYTHONPYCACHEPREFIX"] = tempfile.mkdtemp(dir=cache)
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def measure_imports(runs: int) -> dict[str, dict[str, float]]:
+    """Median self/cumulative import time (ms) per module of the interactive startup path (warm cache)."""
+    samples: dict[str, list[tuple[int, int]]] = {}
+    for _ in range(runs):
+        for module, self_us, cumulative_us in profile_imports():
+            samples.setdefault(module, []).append((self_us, cumulative_us))
+    return {
+        module: {
+            "self_ms": statistics.median(s for s, _ in values) / 1000,
+            "cumulative_ms": statistics.median(c for _, c in values) / 1000,
+        }
+        for module, values in samples.items()
+    }
+
+def summarize(times: list[float]) -> dict[str, float]:
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "max_ms": max(times)}
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+# ------------------------------------------------------------------------------
+# Report
+# ------------------------------------------------------------------------------
+def print_report(results: dict, baseline: dict | None, top: int) -> None:
+    print(f"{'case':<16}  {'cold ms':>8}  {'warm ms':>8}  {'Δ warm':>8}")
+    for name, result in results["startup"].items():
+        cold, warm = result["cold"]["median_ms"], result["warm"]["median_ms"]
+        delta = ""
+        if baseline and name in baseline["startup"]:
+            delta = f"{warm - baseline['startup'][name]['warm']['median_ms']:+8.1f}"
+        print(f"{name:<16}  {cold:8.1f}  {warm:8.1f}  {delta:>8}")
+
+    print("")
+    print(f"{'self ms':>8}  {'cumul ms':>8}  module")
+    slowest = sorted(results["imports"].items(), key=lambda item: item[1]["self_ms"], reverse=True)[:top]
+    for module, result in slowest:
+        print(f"{result['self_ms']:8.2f}  {result['cumulative_ms']:8.2f}  {module}")
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark startup and import time of dotfiles.py.")
+    parser.add_argument("--runs", type=int, default=10, help="runs per case (default: 10)")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to print (default: 15)")
+    parser.add_argument("--output", type=Path, help="JSON output file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, metavar="JSON", help="previous results to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "startup": {
+            name: {"cold": summarize(measure(case, args.runs, cold=True)), "warm": summarize(measure(case, args.runs, cold=False))}
+            for name, case in CASES.items()
+        },
+        "imports": measure_imports(args.runs),
+    }
+
+    output = args.output or ROOT / "benchmarks" / "results" / f"{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(results, baseline, args.top)
+    print("")
+    print(f"results written to {output}")
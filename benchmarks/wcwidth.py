@@ -0,0 +1,112 @@
+"""Width computation benchmark for the vendored wcwidth.
+
+Compares the flat per-codepoint BMP tables against the interval tables resolved with `bisearch`, per codepoint and
+on whole strings (`wcswidth`, `width`, `iter_graphemes`) of ASCII, CJK and emoji text:
+
+    python benchmarks/wcwidth.py                       # flat tables vs bisearch, current tree
+    python benchmarks/wcwidth.py --baseline HEAD~1     # also time the string functions of wcwidth at another commit
+"""
+import argparse
+import io
+import json
+import subprocess
+import sys
+import tarfile
+import tempfile
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# ------------------------------------------------------------------------------
+# Corpora
+# ------------------------------------------------------------------------------
+CORPORA: dict[str, list[str]] = {
+    "ascii": ["python dotfiles.py backup --all --dry-run", "def plan_operations(handlers, strategy=None):", "VSCode / Cursor"] * 20,
+    "cjk":   ["設定ファイルのバックアップ", "コンニチハ、世界", "한국어 텍스트와 漢字 mixed with latin"] * 20,
+    "emoji": ["ok 👨‍👩‍👧 family", "flags 🇺🇸🇧🇷 and ✔️ checks", "thumbs 👍🏽 up ☕ coffee"] * 20,
+    # more distinct codepoints than the lru_caches of the bisearch path hold
+    "cjk-many": ["".join(chr(ucs) for ucs in range(start, start + 40)) for start in range(0x4E00, 0x4E00 + 4000, 40)],
+}
+"""Lines of each kind of text, as a terminal UI would measure them on a repaint."""
+
+# ------------------------------------------------------------------------------
+# Measure
+# ------------------------------------------------------------------------------
+STRING_BENCH = """
+import json, sys, timeit
+from wcwidth import wcswidth, width, iter_graphemes
+corpora, number = json.loads(sys.stdin.read())
+results = {}
+for name, lines in corpora.items():
+    for function in (wcswidth, width, lambda line: list(iter_graphemes(line))):
+        label = getattr(function, "__name__", "<lambda>").replace("<lambda>", "iter_graphemes")
+        # best of 5, in microseconds per line
+        seconds = min(timeit.repeat(lambda: [function(line) for line in lines], number=number, repeat=5))
+        results[f"{name} {label}"] = seconds / number / len(lines) * 1e6
+print(json.dumps(results))
+"""
+"""Times the string functions of whichever wcwidth is first on `sys.path`; run in a fresh interpreter per tree."""
+
+def measure_strings(vendor: Path, number: int) -> dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys; sys.path.insert(0, {str(vendor)!r})\n{STRING_BENCH}"],
+        input=json.dumps([CORPORA, number]), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout)
+
+def measure_codepoints(number: int) -> dict[str, float]:
+    """Nanoseconds per codepoint width lookup, with bisearch over the interval tables and with the flat table."""
+    sys.path.insert(0, str(ROOT / "vendor"))
+    from wcwidth._constants import _BMP_WIDTH, _WIDE_EASTASIAN_TABLE, _ZERO_WIDTH_TABLE
+    from wcwidth.bisearch import bisearch
+
+    def bisearch_width(ucs: int) -> int:
+        if 32 <= ucs < 0x7f:
+            return 1
+        if ucs and ucs < 32 or 0x07F <= ucs < 0x0A0:
+            return -1
+        if bisearch(ucs, _ZERO_WIDTH_TABLE):
+            return 0
+        if bisearch(ucs, _WIDE_EASTASIAN_TABLE):
+            return 2
+        return 1
+
+    results = {}
+    for name, lines in CORPORA.items():
+        codepoints = [ord(char) for line in lines for char in line if ord(char) < 0x10000]
+        for label, lookup in (("bisearch", lambda: [bisearch_width(ucs) for ucs in codepoints]), ("flat", lambda: [_BMP_WIDTH[ucs] - 1 for ucs in codepoints])):
+            seconds = min(timeit.repeat(lookup, number=number, repeat=5))
+            results[f"{name} {label}"] = seconds / number / len(codepoints) * 1e9
+    return results
+
+def checkout_vendor(rev: str, directory: Path) -> Path:
+    """Extract `vendor/wcwidth` of a commit into `directory`; returns the vendor dir to put on `sys.path`."""
+    archive = subprocess.run(["git", "archive", rev, "vendor/wcwidth"], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory, filter="data")
+    return directory / "vendor"
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark width computation of the vendored wcwidth.")
+    parser.add_argument("--number", type=int, default=200, help="iterations per timing (default: 200)")
+    parser.add_argument("--baseline", metavar="REV", help="also time the string functions of wcwidth at this commit")
+    args = parser.parse_args()
+
+    print(f"{'codepoint lookup':<24}  {'ns':>8}")
+    for name, ns in measure_codepoints(args.number).items():
+        print(f"{name:<24}  {ns:8.1f}")
+
+    print("")
+    current = measure_strings(ROOT / "vendor", args.number)
+    baseline = {}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = measure_strings(checkout_vendor(args.baseline, Path(directory)), args.number)
+    print(f"{'per line':<24}  {'µs':>8}  {'baseline':>8}  {'speedup':>8}")
+    for name, us in current.items():
+        base = f"{baseline[name]:8.2f}  {baseline[name] / us:7.1f}x" if name in baseline else ""
+        print(f"{name:<24}  {us:8.2f}  {base}")
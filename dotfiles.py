@@ -1,96 +1,1387 @@
+import argparse
+import errno
+import fnmatch
 import functools
+import hashlib
+import heapq
+import json
 import os
 import platform
+import re
 import shutil
+import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from enum import StrEnum
 from pathlib import Path
+from stat import S_ISREG
+from typing import BinaryIO, NamedTuple, TextIO
 
 sys.path.insert(0, str(Path(__file__).parent / "vendor"))
 
-from collections.abc import Callable
-
-from dotfiles_tui import show_tui
+from collections.abc import Callable, Iterable, Iterator
 
 # ------------------------------------------------------------------------------
 # Classes
 # ------------------------------------------------------------------------------
-class File(Path):
-    # track dotfiles dirs that we already deleted
-    _deleted: set = set()
-    # when False, deletes dotfiles/<app>/; when True, deletes dotfiles/<category>/<app>/ (example: JetBrains/<app>/)
-    _subdir: bool = False
+class Strategy(StrEnum):
+    """How a restore puts files in place; strategies the platform or filesystem can't do fall back to `COPY`."""
+    COPY     = "copy"
+    SYMLINK  = "symlink"
+    HARDLINK = "hardlink"
+    REFLINK  = "reflink"
 
-    def __rshift__(self, other) -> None:
-        """Copy a source to a target. Automatically detects if source is a file or directory."""
-        target = File(other)
-        target._delete_dotfiles_root_once()
-        if self.is_file():
-            self._copy_file(target)
-        else:
-            self._copy_dir(target)
+class Rules(NamedTuple):
+    """Which files directory transfers copy, as globs over paths relative to the copied dir.
+
+    A glob without "/" matches any file or dir name (e.g. `*.log`, `workspaceStorage`); one with "/" matches the
+    whole relative path. Excluded dirs are pruned while walking, so nothing under them is even listed. When
+    `include` is set, only files matching one of its globs are copied. Files over `max_size` bytes are skipped.
+    """
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    max_size: int | None = None
+
+    def for_backup(self) -> "Rules":
+        """These rules plus the defaults of every backup: `EXCLUDE`, and `MAX_FILE_SIZE` unless a limit is set."""
+        return Rules(self.include, EXCLUDE + self.exclude, MAX_FILE_SIZE if self.max_size is None else self.max_size)
+
+    def skip_dir(self, relative: str) -> str | None:
+        """Why a dir is pruned, or None when it is walked."""
+        pattern = _glob_match(self.exclude, relative)
+        return f"excluded by {pattern}" if pattern else None
+
+    def skip_file(self, relative: str, size: int) -> str | None:
+        """Why a file is not copied, or None when it is."""
+        if pattern := _glob_match(self.exclude, relative):
+            return f"excluded by {pattern}"
+        if self.include and not _glob_match(self.include, relative):
+            return "not included"
+        if self.max_size is not None and size > self.max_size:
+            return f"larger than {format_bytes(self.max_size)}"
+        return None
+
+def _glob_match(patterns: tuple[str, ...], relative: str) -> str | None:
+    """First of `patterns` matching a relative path (names are matched by globs without "/")."""
+    name = relative.rpartition("/")[2]
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(relative if "/" in pattern else name, pattern):
+            return pattern
+    return None
+
+class Context:
+    """State of a single backup/restore/sync operation, so operations can run concurrently."""
+    app: str
+    # name of the handler that created the context (e.g. backup_helix)
+    name: str
+    # when False, tracks dotfiles/<app>/; when True, tracks dotfiles/<category>/<app>/ (example: JetBrains/<app>/)
+    subdir: bool
+    # how restored files are put in place
+    strategy: Strategy
+    # when True (sync), backup files are replaced one by one instead of swapping in a staging copy of their root
+    in_place: bool
+    # dotfiles roots staged by the operation; those with written files, and those where a copy failed
+    roots: set
+    changed: set
+    failed: set
+    # transfers emitted by the handler, executed after all selected handlers ran; `unsupported` when the app has
+    # nothing to copy on this system at all (an empty plan may also mean nothing of it is installed)
+    plan: list["Transfer"]
+    unsupported: bool
+    # which files directory transfers copy (backups add the defaults, see `rules_for`), and (path, reason) of those they skipped
+    rules: Rules
+    excluded: list[tuple[str, str]]
+    # sync only: (live, backup) pairs copied or deleted, whose base is updated once executed; live paths in conflict
+    synced: list[tuple["File", "File"]]
+    conflicts: list[str]
+    # metrics: wall time (planning and executing), files examined, written and skipped (unchanged), bytes written, errors
+    elapsed: float
+    examined: int
+    written: int
+    skipped: int
+    bytes_written: int
+    errors: int
+    # (seconds, path) of the slowest files, as a min-heap of at most `SLOWEST` entries
+    slowest: list[tuple[float, str]]
+    # progress while executing: "waiting", "running", "done" or "cancelled"; source bytes planned and processed so far
+    state: str
+    started: float
+    bytes_total: int
+    bytes_done: int
+    # log lines, printed together when the operation finishes
+    logs: list[str]
+
+    SLOWEST = 5
 
-    def _copy_dir(self, target: "File") -> None:
-        """Copy a local directory to a local target."""
+    def __init__(self, app: str, name: str = "", subdir: bool = False, strategy: Strategy = Strategy.COPY, rules: Rules = Rules()):
+        self.app = app
+        self.name = name
+        self.subdir = subdir
+        self.strategy = strategy
+        self.in_place = False
+        self.plan = []
+        self.unsupported = False
+        self.rules = rules
+        self.excluded = []
+        self.synced = []
+        self.conflicts = []
+        self.roots = set()
+        self.changed = set()
+        self.failed = set()
+        self.elapsed = 0.0
+        self.examined = 0
+        self.written = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self.slowest = []
+        self.state = "waiting"
+        self.started = 0.0
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.logs = []
+
+    def execute(self) -> None:
+        """Execute the planned transfers in this context."""
+        token = CONTEXT.set(self)
+        self.state = "running"
+        self.started = time.perf_counter()
         try:
+            for transfer in self.plan:
+                if CANCEL.is_set():
+                    break
+                transfer.execute()
+            for root in self.roots:
+                _swap_dotfiles_root(root)
+            for live, backup in self.synced:
+                SYNC_STATE.settle(live, backup)
+        finally:
+            self.elapsed += time.perf_counter() - self.started
+            self.state = "cancelled" if CANCEL.is_set() else "done"
+            CONTEXT.reset(token)
+            self.flush()
+
+    def rules_for(self, target: "File") -> Rules:
+        """Copy rules of a directory transfer into `target`; only backups leave out the files of the default rules."""
+        return self.rules.for_backup() if target._is_backup() else self.rules
+
+    def seconds(self) -> float:
+        """Wall time so far, including the running part of the execution."""
+        return self.elapsed + (time.perf_counter() - self.started if self.state == "running" else 0.0)
+
+    def record_file(self, path: Path, seconds: float) -> None:
+        self.examined += 1
+        heapq.heappush(self.slowest, (seconds, str(path)))
+        if len(self.slowest) > Context.SLOWEST:
+            heapq.heappop(self.slowest)
+
+    def metrics(self) -> dict:
+        return {
+            "app": self.app,
+            "handler": self.name,
+            "seconds": round(self.elapsed, 6),
+            "examined": self.examined,
+            "written": self.written,
+            "skipped": self.skipped,
+            "bytes_written": self.bytes_written,
+            "errors": self.errors,
+            "excluded": [{"path": path, "reason": reason} for path, reason in self.excluded],
+            "conflicts": self.conflicts,
+            "slowest": [{"path": path, "ms": round(seconds * 1000, 3)} for seconds, path in sorted(self.slowest, reverse=True)],
+        }
+
+    def stage(self, target: "File") -> Path:
+        """Path where `target` is actually written: inside the staging copy of its root for backups, itself otherwise."""
+        root = target._dotfiles_root()
+        if root is None or self.in_place:
+            return target
+        staging = _staging(root)
+        if root not in self.roots:
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(parents=True)
+            self.roots.add(root)
+        return staging / target.relative_to(root)
+
+    def flush(self) -> None:
+        with PRINT_LOCK:
+            for line in self.logs:
+                _print_log(line)
+        self.logs.clear()
+
+CONTEXT: ContextVar[Context] = ContextVar("context")
+"""Operation running in the current thread; set by the `operation` decorator."""
+
+PRINT_LOCK = threading.Lock()
+"""Keeps log lines of concurrent operations from interleaving."""
+
+HELD_LOGS: list[str] | None = None
+"""While set (the picker is on screen), log lines are kept here instead of printed, to be printed afterwards."""
+
+CANCEL = threading.Event()
+"""Set to stop running operations between files; backups they staged are left untouched."""
+
+class Transfer(NamedTuple):
+    """A planned copy from `source` to `target`; `kind` is "file" or "dir", or "del" to delete `target` (sync only:
+    its `source` was deleted).
+
+    An `optional` transfer is dropped quietly when its source is missing, for handlers that map every file an app
+    may have instead of listing the ones backed up. `also` holds more targets filled from the same read of `source`
+    (e.g. VSCode and its forks restored from one backup), merged in by `plan_operations`.
+    """
+    source: "File"
+    target: "File"
+    kind: str
+    optional: bool = False
+    also: tuple["File", ...] = ()
+
+    @property
+    def targets(self) -> list["File"]:
+        return [self.target, *self.also]
+
+    def execute(self) -> None:
+        if self.optional and not self.source.exists():
+            return
+        if self.kind == "del":
+            for target in self.targets:
+                target._delete()
+        elif self.kind == "file":
+            self.source._copy_file(self.targets)
+        else:
+            self.source._copy_dir(self.targets)
+
+    def size(self, rules: Rules) -> int:
+        """Bytes the transfer reads from its source (0 when the source is missing)."""
+        if self.kind == "del":
+            return 0
+        if self.kind == "file":
+            return self.source.stat().st_size if self.source.is_file() else 0
+        return sum(source.stat().st_size for source in self.source._walk(rules))
+
+class File(Path):
+    def __rshift__(self, other) -> None:
+        """Plan copying a source to a target. Automatically detects if source is a file or directory."""
+        CONTEXT.get().plan.append(Transfer(self, File(other), "dir" if self.is_dir() else "file"))
+
+    def _copy_dir(self, targets: list["File"]) -> None:
+        """Copy a local directory to local targets, file by file, reading each file once for all targets."""
+        for target in targets:
             log_transfer("dir", self, target)
-            target.mkdir(parents=True, exist_ok=True)
-            shutil.copytree(self, target, dirs_exist_ok=True)
-            if target._is_backup():
-                for path in target.rglob("*"):
-                    if path.is_file():
-                        _ensure_trailing_newline(path)
+        try:
+            if not self.is_dir():
+                raise FileNotFoundError(f"No such directory: '{self}'")
         except Exception as e:
-            log_error("Failed to copy directory", e)
-
-    def _copy_file(self, target: "File") -> None:
-        """Copy a local file to a local target."""
+            for target in targets:
+                self._copy_failed(target, e)
+                log_error("Failed to copy directory", e)
+            return
+        created = []
+        for target in targets:
+            try:
+                target.mkdir(parents=True, exist_ok=True)
+                created.append(target)
+            except Exception as e:
+                self._copy_failed(target, e)
+                log_error("Failed to copy directory", e)
+        if not created:
+            return
         try:
+            context = CONTEXT.get()
+            excluded: list[tuple[str, str]] = []
+            for source in self._walk(context.rules_for(created[0]), excluded):
+                if CANCEL.is_set():
+                    break
+                relative = source.relative_to(self)
+                source._copy_file_if_changed([target / relative for target in created])
+            self._keep_excluded(created, excluded)
+        except Exception as e:
+            for target in created:
+                self._copy_failed(target, e)
+                log_error("Failed to copy directory", e)
+
+    def _keep_excluded(self, targets: list["File"], excluded: list[tuple[str, str]]) -> None:
+        """Report the paths copy rules skipped; those a backup already holds are carried over into its staging copy.
+
+        Backups only drop files deleted live, so a rule added later never deletes what was backed up before; delete
+        such a file from the dotfiles dir to drop it.
+        """
+        context = CONTEXT.get()
+        for path, reason in excluded:
+            relative = Path(path).relative_to(self)
+            kept = []
+            for target in targets:
+                backup = target / relative
+                if not target._is_backup() or not backup.exists():
+                    continue
+                kept += [backup] if backup.is_file() else [File(backup / file) for file in _tree(backup)]
+            for file in kept:
+                staged = context.stage(file)
+                if staged != file:
+                    _link_or_copy(file, staged)
+            context.excluded.append((path, f"{reason}, kept in the backup" if kept else reason))
+
+    def _walk(self, rules: Rules, excluded: list[tuple[str, str]] | None = None) -> Iterator["File"]:
+        """Regular files under this dir that `rules` let through; skipped paths are appended to `excluded` with the reason.
+
+        Sockets, FIFOs and the like are skipped, since opening a FIFO to read it blocks until something writes to it.
+        """
+        excluded = [] if excluded is None else excluded
+        for dirpath, dirnames, filenames in os.walk(self):
+            prefix = Path(dirpath).relative_to(self).as_posix()
+            prefix = "" if prefix == "." else prefix + "/"
+            # prune excluded dirs in place, so os.walk doesn't descend into them
+            kept = []
+            for dirname in dirnames:
+                if reason := rules.skip_dir(prefix + dirname):
+                    excluded.append((str(Path(dirpath, dirname)), reason))
+                else:
+                    kept.append(dirname)
+            dirnames[:] = kept
+            for filename in filenames:
+                source = File(dirpath, filename)
+                try:
+                    stat = source.stat()
+                except OSError as e:
+                    excluded.append((str(source), f"unreadable: {e.strerror}"))
+                    continue
+                if not S_ISREG(stat.st_mode):
+                    excluded.append((str(source), "not a regular file"))
+                    continue
+                if reason := rules.skip_file(prefix + filename, stat.st_size):
+                    excluded.append((str(source), reason))
+                    continue
+                yield source
+
+    def _copy_file(self, targets: list["File"]) -> None:
+        """Copy a local file to local targets."""
+        for target in targets:
             log_transfer("file", self, target)
-            target.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(self, target)
-            if target._is_backup():
-                _ensure_trailing_newline(target)
+        self._copy_file_if_changed(targets)
+
+    def _copy_file_if_changed(self, targets: list["File"]) -> None:
+        """Copy a single file to each target unless the manifest says it already holds its content, timing it for the metrics.
+
+        Backups are written into the staging copy of their root; unchanged files are hardlinked there from the live root.
+        """
+        context = CONTEXT.get()
+        start = time.perf_counter()
+        try:
+            self._put_file(context, targets)
+        finally:
+            # examined once however many targets it fans out to; written and skipped count per target
+            context.record_file(self, time.perf_counter() - start)
+            try:
+                context.bytes_done += self.stat().st_size
+            except OSError:
+                pass
+
+    def _delete(self) -> None:
+        """Delete a file whose copy was deleted on the other side of a sync, keeping it in the journal."""
+        log(f"{COLOR_YELLOW}del {COLOR_RESET}  {self}")
+        context = CONTEXT.get()
+        try:
+            JOURNAL.preserve(self)
+            self.unlink(missing_ok=True)
+            MANIFEST.forget(self)
+            context.written += 1
         except Exception as e:
-            log_error("Failed to copy file", e)
+            log_error("Failed to delete file", e)
+        context.record_file(self, 0.0)
+
+    def _put_file(self, context: Context, targets: list["File"]) -> None:
+        """Put this file at every target, reading it at most once; a failure only affects its own target."""
+        pending: dict[tuple["Transform", ...], list[tuple[File, Path]]] = {}
+        for target in targets:
+            try:
+                staged = self._skip_or_stage(context, target)
+                if staged is not None:
+                    pending.setdefault(target._transforms(), []).append((target, staged))
+            except Exception as e:
+                self._copy_failed(target, e)
+                log_error("Failed to copy file", e)
+
+        for transforms, group in pending.items():
+            # files not staged (restores, syncs) are written beside the target and renamed over it, so they are never
+            # half-written and the original inode kept by the journal is left alone
+            writes = [staged if staged != target else _temporary(target) for target, staged in group]
+            try:
+                for path in writes:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                digest, size, errors = _stream_copy_many(self, writes, transforms)
+            except Exception as e:
+                errors = {path: e for path in writes}
+            for (target, staged), path in zip(group, writes):
+                if path != staged and path not in errors:
+                    try:
+                        JOURNAL.replace(path, target)
+                    except OSError as e:
+                        errors[path] = e
+                if path in errors:
+                    if path != staged:
+                        path.unlink(missing_ok=True)
+                    self._copy_failed(target, errors[path])
+                    log_error("Failed to copy file", errors[path])
+                    continue
+                if target._is_backup():
+                    context.changed.add(target._dotfiles_root())
+                MANIFEST.record(self, target, staged, digest)
+                context.written += 1
+                context.bytes_written += size
+
+    def _skip_or_stage(self, context: Context, target: "File") -> Path | None:
+        """Handle a target that needs no read of this file (linked, or unchanged); otherwise return where to write it."""
+        if not target._is_backup() and JOURNAL.restored(target):
+            # already put in place by the interrupted run being resumed
+            context.skipped += 1
+            return None
+        if not target._is_backup() and context.strategy != Strategy.COPY:
+            self._link_if_changed(target, context.strategy)
+            return None
+        staged = context.stage(target)
+        if target._is_backup() and MANIFEST.linked(self):
+            # restored as a link to this very backup file, so there is nothing to copy back
+            if staged != target:
+                _link_or_copy(target, staged)
+            context.skipped += 1
+            return None
+        if not target._is_backup() and _is_linked_any(self, target):
+            # restored as a link before: copying breaks the link, so the live file stops writing into the repo
+            return staged
+        if MANIFEST.unchanged(self, target):
+            if staged != target:
+                _link_or_copy(target, staged)
+            context.skipped += 1
+            return None
+        return staged
+
+    def _link_if_changed(self, target: "File", strategy: Strategy) -> None:
+        """Restore a single file as a link to this backup file, unless it already is one."""
+        context = CONTEXT.get()
+        if _is_linked(self, target, strategy):
+            context.skipped += 1
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        JOURNAL.preserve(target)
+        used = _link(self, target, strategy)
+        if used == Strategy.COPY:
+            log(f"{COLOR_YELLOW}copy{COLOR_RESET}  {target}: {strategy} unsupported here")
+            MANIFEST.record(self, target, target, _fingerprint(self, None)[2])
+            context.bytes_written += target.stat().st_size
+        else:
+            MANIFEST.record_link(self, target, used)
+        JOURNAL.finish(target)
+        context.written += 1
+
+    def _copy_failed(self, target: "File", exception: Exception) -> None:
+        """Keep the live backup root when a copy into it failed; a missing source only drops that file."""
+        root = target._dotfiles_root()
+        if root is not None and not (isinstance(exception, FileNotFoundError) and not self.exists()):
+            CONTEXT.get().failed.add(root)
 
     def _is_backup(self) -> bool:
         """True when this path is a backup target (inside the dotfiles dir)."""
         return self.is_relative_to(DOTFILES)
 
-    def _delete_dotfiles_root_once(self) -> None:
-        """First write into the cleanup root (dotfiles/<app>/... by default) deletes it once per session."""
+    def _transforms(self) -> tuple["Transform", ...]:
+        """Transforms applied to the bytes copied into this target."""
+        return BACKUP_TRANSFORMS if self._is_backup() else ()
+
+    def _dotfiles_root(self) -> "File | None":
+        """Root replaced as a whole by a backup (dotfiles/<app>/ by default), or None outside the dotfiles dir."""
         # check if inside dotfiles dir
         if not self._is_backup():
-            return
+            return None
 
-        # extract root to delete; if `subdir` is set, go one level deeper than dotfiles/<app>/
+        # extract root; if `subdir` is set, go one level deeper than dotfiles/<app>/
         parts = self.relative_to(DOTFILES).parts
-        if File._subdir:
-            root = DOTFILES / parts[0] / parts[1]
-        else:
-            root = DOTFILES / parts[0]
+        if CONTEXT.get().subdir:
+            return DOTFILES / parts[0] / parts[1]
+        return DOTFILES / parts[0]
 
-        # check if already deleted
-        if root in File._deleted:
-            return
+def _staging(root: Path) -> Path:
+    return root.parent / f".{root.name}.staging"
+
+def _temporary(path: Path) -> Path:
+    """Sibling a file is written to before being renamed over `path`."""
+    return path.with_name(f".{path.name}.tmp")
+
+def _swap_dotfiles_root(root: File) -> None:
+    """Replace a backup root with its staging copy using renames, so the repo never holds a partial backup.
+
+    Files only present in the live root are stale and dropped. Nothing is swapped when the staging copy is
+    identical or when a copy into it failed. A failed rename leaves the previous backup in place and is reported
+    like a failed copy, so the other operations of the run go on.
+    """
+    context = CONTEXT.get()
+    staging = _staging(root)
+    if CANCEL.is_set():
+        # files not copied yet would look stale, so a partial staging copy never replaces the backup
+        log(f"{COLOR_YELLOW}keep{COLOR_RESET}  {root}: cancelled, backup left untouched")
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+    stale = [path for path in _tree(root) if not (staging / path).exists()]
+    if root in context.failed or (root not in context.changed and not stale):
+        if root in context.failed:
+            log(f"{COLOR_YELLOW}keep{COLOR_RESET}  {root}: copy failed, backup left untouched")
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+
+    old = root.parent / f".{root.name}.old"
+    shutil.rmtree(old, ignore_errors=True)
+    try:
+        if root.exists():
+            root.rename(old)
+        staging.rename(root)
+    except OSError as e:
+        try:
+            if not root.exists() and old.exists():
+                old.rename(root)
+        except OSError:
+            pass # put back at the next start by _recover_dotfiles_roots
+        shutil.rmtree(staging, ignore_errors=True)
+        context.failed.add(root)
+        log_error("Failed to replace backup", e)
+        return
+    shutil.rmtree(old, ignore_errors=True)
+    for path in stale:
+        log(f"{COLOR_YELLOW}del {COLOR_RESET}  {root / path}")
+        MANIFEST.forget(root / path)
+
+def _recover_dotfiles_roots() -> None:
+    """Put back the backup roots a swap left renamed to `.<root>.old` when the process died between its renames.
+
+    Called before runs that write, and before planning them so restores read the recovered roots.
+    """
+    for old in [*DOTFILES.glob(".*.old"), *DOTFILES.glob("*/.*.old")]:
+        root = old.with_name(old.name[1:-len(".old")])
+        try:
+            if root.exists():
+                # the swap finished, only removing the previous backup was left
+                shutil.rmtree(old)
+            else:
+                old.rename(root)
+                log(f"{COLOR_YELLOW}undo{COLOR_RESET}  {root}: interrupted backup, previous backup put back")
+        except OSError as e:
+            log_error("Failed to recover backup", e)
+
+def _tree(root: Path) -> list[Path]:
+    """Relative paths of all files under `root`."""
+    return [Path(dirpath, filename).relative_to(root) for dirpath, _, filenames in os.walk(root) for filename in filenames]
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+# ------------------------------------------------------------------------------
+# Streaming copy
+# ------------------------------------------------------------------------------
+Transform = Callable[[Iterator[bytes]], Iterator[bytes]]
+"""Rewrites a file's content while it is copied, chunk by chunk, so memory stays bounded."""
+
+CHUNK_SIZE = 1024 * 1024
+
+def ensure_trailing_newline(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Append a newline if the content is non-empty and doesn't already end with one."""
+    last = b""
+    for chunk in chunks:
+        if chunk:
+            last = chunk[-1:]
+        yield chunk
+    if last not in (b"", b"\n"):
+        yield b"\n"
+
+BACKUP_TRANSFORMS: tuple[Transform, ...] = (ensure_trailing_newline,)
+"""Transforms applied to every file written into the dotfiles dir."""
+
+def _read_chunks(path: Path, transforms: Iterable[Transform] = ()) -> Iterator[bytes]:
+    """Content of a file in chunks, after `transforms`. The file is opened right away, so a missing file raises here."""
+    f = open(path, "rb")
+    def chunks() -> Iterator[bytes]:
+        with f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+    stream = chunks()
+    for transform in transforms:
+        stream = transform(stream)
+    return stream
+
+def _stream_copy(source: Path, target: Path, transforms: tuple[Transform, ...] = ()) -> tuple[str, int]:
+    """Copy a file in a single pass, applying `transforms` to the bytes in flight; returns sha256 and size of what was written.
+
+    Metadata is copied like `shutil.copy2` does, so pass-through copies keep the same semantics.
+    """
+    digest, size, errors = _stream_copy_many(source, [target], transforms)
+    if errors:
+        raise errors[target]
+    return digest, size
+
+def _stream_copy_many(source: Path, targets: list[Path], transforms: tuple[Transform, ...] = ()) -> tuple[str, int, dict[Path, Exception]]:
+    """Copy a file to several targets reading it once; returns sha256 and size of what was written, and the targets that failed.
+
+    A target that can't be opened or written is dropped with its error while the others are completed. Failing to
+    read the source raises.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    chunks = _read_chunks(source, transforms)
+    files: dict[Path, BinaryIO] = {}
+    errors: dict[Path, Exception] = {}
+    try:
+        for target in targets:
+            try:
+                files[target] = open(target, "wb")
+            except OSError as e:
+                errors[target] = e
+        for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+            for target, f in list(files.items()):
+                try:
+                    f.write(chunk)
+                except OSError as e:
+                    errors[target] = e
+                    del files[target]
+                    f.close()
+    finally:
+        for target, f in files.items():
+            try:
+                f.close()
+            except OSError as e:
+                errors[target] = e
+    for target in files:
+        if target not in errors:
+            try:
+                shutil.copystat(source, target)
+            except OSError as e:
+                errors[target] = e
+    return digest.hexdigest(), size, errors
+
+# ------------------------------------------------------------------------------
+# Links
+# ------------------------------------------------------------------------------
+FICLONE = 0x40049409
+CLONE_NOFOLLOW = 0x0001
+"""Linux ioctl that makes a file share the extents of another one (copy-on-write clone)."""
+
+def _link(source: Path, target: Path, strategy: Strategy) -> Strategy:
+    """Put `source` at `target` with `strategy`, replacing the target atomically; returns the strategy actually used.
+
+    Falls back to a streamed copy when the strategy isn't possible (no symlink privilege, cross-device hardlink,
+    filesystem without clones, ...).
+    """
+    temporary = _temporary(target)
+    temporary.unlink(missing_ok=True)
+    try:
+        match strategy:
+            case Strategy.SYMLINK:
+                os.symlink(source.absolute(), temporary)
+            case Strategy.HARDLINK:
+                os.link(source, temporary)
+            case Strategy.REFLINK:
+                _reflink(source, temporary)
+        os.replace(temporary, target)
+        return strategy
+    except OSError:
+        temporary.unlink(missing_ok=True)
+        _stream_copy(source, temporary)
+        os.replace(temporary, target)
+        return Strategy.COPY
 
-        # delete and track
-        shutil.rmtree(root, ignore_errors=True)
-        File._deleted.add(root)
+def _reflink(source: Path, target: Path) -> None:
+    """Clone `source` into the new file `target`: FICLONE on Linux (Btrfs, XFS), clonefile(2) on macOS (APFS)."""
+    if SYSTEM == OS.MAC:
+        import ctypes
+        clonefile = getattr(ctypes.CDLL(None, use_errno=True), "clonefile", None)
+        if clonefile is None:
+            raise OSError(errno.EOPNOTSUPP, "clonefile is unavailable before macOS 10.12", str(target))
+        if clonefile(os.fsencode(source), os.fsencode(target), CLONE_NOFOLLOW) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(target))
+        return
+    if SYSTEM != OS.LINUX:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are unsupported on this platform", str(target))
+    import fcntl
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            target.unlink(missing_ok=True)
+            raise
+    shutil.copystat(source, target)
 
-def _ensure_trailing_newline(path: Path) -> None:
-    """Append a newline if the file is non-empty and doesn't already end with one."""
+def _is_linked(source: Path, target: Path, strategy: Strategy) -> bool:
+    """True when `target` is already a `strategy` link to `source`. Reflinks are independent files, so never."""
     try:
-        with open(path, "rb+") as f:
-            f.seek(0, os.SEEK_END)
-            if f.tell() == 0:
+        match strategy:
+            case Strategy.SYMLINK:
+                return target.is_symlink() and Path(os.readlink(target)) == source.absolute()
+            case Strategy.HARDLINK:
+                return not target.is_symlink() and target.samefile(source)
+    except OSError:
+        pass
+    return False
+
+def _is_linked_any(source: Path, target: Path) -> bool:
+    """True when `target` is a symlink or hardlink to `source`, so it holds the same content without being a copy."""
+    return _is_linked(source, target, Strategy.SYMLINK) or _is_linked(source, target, Strategy.HARDLINK)
+
+class Manifest:
+    """Size, mtime and content hash of every copied pair, keyed by target path.
+
+    A pair whose source and target stats both match the recorded ones is skipped without reading any bytes.
+    When a stat changed (e.g. after a `git checkout`), the content hashes decide.
+    """
+    path: Path
+    entries: dict[str, dict[str, list]]
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            self.entries = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self) -> None:
+        try:
+            self.path.write_text(json.dumps(self.entries, indent=1, sort_keys=True))
+        except Exception as e:
+            log_error("Failed to save manifest", e)
+
+    def unchanged(self, source: File, target: File) -> bool:
+        """True when `target` already holds what copying `source` would write."""
+        if not target.is_file():
+            return False
+        entry = self.entries.get(str(target), {})
+        expected = _fingerprint(source, entry.get("source"), target._transforms())
+        actual = _fingerprint(target, entry.get("target"))
+        if expected[2] != actual[2]:
+            return False
+        self.entries[str(target)] = {"source": expected, "target": actual}
+        return True
+
+    def record(self, source: File, target: File, written: Path, digest: str) -> None:
+        """Record a pair just copied, using the hash computed while copying, so neither side is re-read.
+
+        `written` is where the bytes actually went, which differs from `target` for a staging copy.
+        """
+        source_stat, written_stat = source.stat(), written.stat()
+        self.entries[str(target)] = {
+            "source": [source_stat.st_size, source_stat.st_mtime_ns, digest],
+            "target": [written_stat.st_size, written_stat.st_mtime_ns, digest],
+        }
+
+    def record_link(self, source: File, target: File, strategy: Strategy) -> None:
+        """Record that `target` was restored as a link to `source`, so backups can recognize it."""
+        self.entries[str(target)] = {"link": strategy, "to": str(source)}
+
+    def linked(self, path: File) -> bool:
+        """True when `path` was restored as a link to a backup file and still is one."""
+        entry = self.entries.get(str(path), {})
+        return "link" in entry and _is_linked(Path(entry["to"]), path, Strategy(entry["link"]))
+
+    def forget(self, target: Path) -> None:
+        self.entries.pop(str(target), None)
+
+def _fingerprint(path: Path, previous: list | None, transforms: tuple[Transform, ...] = ()) -> list:
+    """[size, mtime_ns, sha256] of a file, reusing `previous` hash when size and mtime did not change.
+
+    The hash is of the content as it would be written after `transforms`.
+    """
+    stat = path.stat()
+    if previous and previous[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return previous
+    digest = hashlib.sha256()
+    for chunk in _read_chunks(path, transforms):
+        digest.update(chunk)
+    return [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+
+# ------------------------------------------------------------------------------
+# Snapshots
+# ------------------------------------------------------------------------------
+class Store:
+    """Content-addressed store of backed up files, with a tree manifest per snapshot.
+
+    File contents are kept once by sha256 under `objects/`, so identical files (across JetBrains tools, apps or
+    snapshots) share one object and each snapshot only adds the bytes that changed since the previous ones.
+    A snapshot is `snapshots/<id>.json`: dotfiles dir → relative path → sha256.
+    """
+    path: Path
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def object(self, digest: str) -> Path:
+        return self.path / "objects" / digest[:2] / digest[2:]
+
+    def put(self, file: Path, digest: str) -> int:
+        """Store a file's content under its digest; returns the bytes added (0 when already stored)."""
+        target = self.object(digest)
+        if target.exists():
+            return 0
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(f".{target.name}.tmp")
+        shutil.copy2(file, temp)
+        os.replace(temp, target)
+        return target.stat().st_size
+
+    def snapshots(self) -> list[str]:
+        """Snapshot ids, oldest first; ids taken in the same second are numbered (`<time>.<n>`), so `.10` follows `.9`."""
+        def order(id: str) -> tuple[str, int]:
+            stamp, _, count = id.partition(".")
+            return stamp, int(count) if count.isdigit() else 0
+        return sorted((path.stem for path in (self.path / "snapshots").glob("*.json")), key=order)
+
+    def load(self, id: str) -> dict:
+        if id == "latest":
+            ids = self.snapshots()
+            if not ids:
+                raise FileNotFoundError(f"No snapshots in {self.path}")
+            id = ids[-1]
+        return json.loads((self.path / "snapshots" / f"{id}.json").read_text())
+
+    def save(self, trees: dict[str, dict[str, str]], added: int) -> str:
+        """Write a snapshot of `trees` and return its id (the current time, so ids sort chronologically)."""
+        snapshots = self.path / "snapshots"
+        snapshots.mkdir(parents=True, exist_ok=True)
+        id = base = time.strftime("%Y%m%dT%H%M%S")
+        count = 0
+        while (snapshots / f"{id}.json").exists():
+            count += 1
+            id = f"{base}.{count}"
+        snapshot = {"id": id, "trees": trees, "added": added}
+        (snapshots / f"{id}.json").write_text(json.dumps(snapshot, indent=1, sort_keys=True))
+        return id
+
+    def checkout(self, id: str) -> Path:
+        """Materialize a snapshot as a dotfiles dir, hardlinking objects so it costs no extra space.
+
+        An existing checkout is reused only while it still holds exactly the snapshot's files; otherwise it is rebuilt.
+        """
+        snapshot = self.load(id)
+        checkout = self.path / "checkouts" / snapshot["id"]
+        if not self._intact(checkout, snapshot):
+            staging = _staging(checkout)
+            shutil.rmtree(staging, ignore_errors=True)
+            for dir, files in snapshot["trees"].items():
+                for relative, digest in files.items():
+                    _link_or_copy(self.object(digest), staging / dir / relative)
+            staging.mkdir(parents=True, exist_ok=True)
+            shutil.rmtree(checkout, ignore_errors=True)
+            os.replace(staging, checkout)
+        return checkout
+
+    def _intact(self, checkout: Path, snapshot: dict) -> bool:
+        """True when `checkout` holds the snapshot's files and nothing else; files still linked to their object
+        aren't read."""
+        if not checkout.is_dir():
+            return False
+        expected = {Path(dir, relative): digest for dir, files in snapshot["trees"].items() for relative, digest in files.items()}
+        if set(_tree(checkout)) != set(expected):
+            return False
+        try:
+            return all(
+                (checkout / relative).samefile(self.object(digest)) or _fingerprint(checkout / relative, None)[2] == digest
+                for relative, digest in expected.items()
+            )
+        except OSError:
+            return False
+
+def snapshot_backups(contexts: list[Context]) -> str:
+    """Record the backup dirs of the apps in `contexts` as a new snapshot; returns its id.
+
+    Hashes come from the manifest when a file did not change since it was copied, so only new files are read.
+    """
+    trees: dict[str, dict[str, str]] = {}
+    added = 0
+    for context in contexts:
+        dir = app_dir(context.app)
+        files = trees.setdefault(dir.name, {})
+        for relative in _backup_files(dir):
+            file = dir / relative
+            digest = _fingerprint(file, MANIFEST.entries.get(str(file), {}).get("target"))[2]
+            added += STORE.put(file, digest)
+            files[relative.as_posix()] = digest
+    id = STORE.save(trees, added)
+    log(f"{COLOR_CYAN}snap{COLOR_RESET}  {id}: {sum(map(len, trees.values()))} files, {format_bytes(added)} added to {STORE.path}")
+    return id
+
+def app_rules(app: str) -> Rules:
+    """Copy rules of an app, or none for apps not in `APPS`; backups add the defaults (see `Rules.for_backup`)."""
+    return APPS_BY_NAME[app].rules() if app in APPS_BY_NAME else Rules()
+
+def app_dir(app: str) -> File:
+    """Backup dir of an app (dotfiles/<dir>/)."""
+    return DOTFILES / APPS_BY_NAME[app].dir
+
+def _backup_files(dir: Path) -> list[Path]:
+    """Relative paths of the files backed up under `dir`, leaving out staging and old roots of interrupted backups."""
+    return [relative for relative in _tree(dir) if not any(part.startswith(".") and part.endswith((".staging", ".old")) for part in relative.parts)]
+
+def print_history() -> None:
+    """Print every snapshot with the apps it covers and the bytes it added to the store."""
+    for id in STORE.snapshots():
+        snapshot = STORE.load(id)
+        files = sum(map(len, snapshot["trees"].values()))
+        print(f"{id:<20} {files:6} files {format_bytes(snapshot['added']):>10} added  {', '.join(sorted(snapshot['trees']))}")
+
+# ------------------------------------------------------------------------------
+# Archive
+# ------------------------------------------------------------------------------
+def export_archive(apps: list[str], archive: BinaryIO) -> list[Context]:
+    """Write the backups of `apps` to `archive` as a streamed tar.gz, one member per file (`<dir>/<path>`).
+
+    The archive is written sequentially, so it can be a pipe; memory stays bounded by the copy buffer.
+    """
+    import tarfile
+    contexts = []
+    with tarfile.open(fileobj=archive, mode="w|gz", bufsize=CHUNK_SIZE) as tar:
+        for app in apps:
+            dir = app_dir(app)
+            context = Context(app, f"export_{dir.name.replace('-', '_')}")
+            token = CONTEXT.set(context)
+            start = time.perf_counter()
+            try:
+                for relative in _backup_files(dir):
+                    file_start = time.perf_counter()
+                    log_transfer("tar", dir / relative, Path(dir.name, relative))
+                    try:
+                        tar.add(dir / relative, (Path(dir.name) / relative).as_posix(), recursive=False)
+                        context.written += 1
+                        context.bytes_written += (dir / relative).stat().st_size
+                    except OSError as e:
+                        log_error("Failed to export file", e)
+                    context.record_file(dir / relative, time.perf_counter() - file_start)
+            finally:
+                context.elapsed += time.perf_counter() - start
+                CONTEXT.reset(token)
+            context.flush()
+            contexts.append(context)
+    return contexts
+
+def import_archive(apps: list[str], archive: BinaryIO, strategy: Strategy | None = None) -> list[Context]:
+    """Restore `apps` straight from a tar.gz written by `export_archive`, reading it once from start to end.
+
+    Each member is mapped to its restore targets through the apps' restore plans, skipping files their copy rules
+    exclude and members of other apps. Like other restores, files are put in place with `strategy` (links point at
+    the member extracted into the dotfiles dir) and journaled, so the import can be rolled back or resumed.
+    """
+    import tarfile
+    contexts = plan_operations([REGISTRY_BY_APP[app][Op.RESTORE] for app in apps], strategy)
+    targets: dict[Path, list[tuple[Context, File]]] = {}
+    for context in contexts:
+        for transfer in context.plan:
+            targets.setdefault(transfer.source, []).extend((context, target) for target in transfer.targets)
+
+    with tarfile.open(fileobj=archive, mode="r|gz", bufsize=CHUNK_SIZE) as tar:
+        for member in tar:
+            relative = Path(member.name)
+            if not member.isfile() or relative.is_absolute() or ".." in relative.parts:
+                continue
+            # the member can only be read once, so further targets (e.g. VSCode and Cursor) copy the first one
+            source: File | None = None
+            seconds: dict[Context, float] = {}
+            for context, target in _import_targets(targets, DOTFILES / relative, member.size):
+                token = CONTEXT.set(context)
+                start = time.perf_counter()
+                try:
+                    log_transfer("tar", relative, target)
+                    if JOURNAL.restored(target):
+                        # already put in place by the interrupted import being resumed
+                        context.skipped += 1
+                        source = source or target
+                    elif source is None and context.strategy == Strategy.COPY:
+                        _write_member(tar, member, target)
+                        MANIFEST.forget(target)
+                        context.written += 1
+                        context.bytes_written += member.size
+                        source = target
+                    else:
+                        if source is None:
+                            # links point into the dotfiles dir, so the member is put there first
+                            source = DOTFILES / relative
+                            _write_member(tar, member, source)
+                        source._put_file(context, [target])
+                except Exception as e:
+                    log_error("Failed to import file", e)
+                finally:
+                    seconds[context] = seconds.get(context, 0.0) + time.perf_counter() - start
+                    context.elapsed += time.perf_counter() - start
+                    CONTEXT.reset(token)
+            # a member is examined once per operation, however many of its targets it goes to
+            for context, elapsed in seconds.items():
+                context.record_file(DOTFILES / relative, elapsed)
+    for context in contexts:
+        context.flush()
+    return contexts
+
+def _import_targets(targets: dict[Path, list[tuple[Context, File]]], path: Path, size: int) -> list[tuple[Context, File]]:
+    """Restore targets of a backup file, from the transfers of the file itself or of its closest planned parent dir.
+
+    Files under a planned dir are dropped (and reported as excluded) when that restore's copy rules skip them.
+    """
+    for source in (path, *path.parents):
+        if source in targets:
+            relative = path.relative_to(source)
+            selected = []
+            for context, target in targets[source]:
+                if source != path and (reason := _import_skipped(context.rules, relative, size)):
+                    context.excluded.append((str(path), reason))
+                else:
+                    selected.append((context, target / relative))
+            return selected
+        if source == DOTFILES:
+            break
+    return []
+
+def _import_skipped(rules: Rules, relative: Path, size: int) -> str | None:
+    """Why copy rules skip a file found under a copied dir, checking its parent dirs like a walk would."""
+    for parent in reversed(relative.parents[:-1]):
+        if reason := rules.skip_dir(parent.as_posix()):
+            return reason
+    return rules.skip_file(relative.as_posix(), size)
+
+def _write_member(tar: "tarfile.TarFile", member: "tarfile.TarInfo", target: Path) -> None:
+    """Stream an archive member into `target`, keeping the member's mode and mtime.
+
+    The member is written beside the target and renamed over it through the journal, like restored files.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = _temporary(target)
+    try:
+        with tar.extractfile(member) as source, open(temporary, "wb") as f:
+            shutil.copyfileobj(source, f, CHUNK_SIZE)
+        os.chmod(temporary, member.mode & 0o7777)
+        os.utime(temporary, (member.mtime, member.mtime))
+        JOURNAL.replace(temporary, target)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+
+# ------------------------------------------------------------------------------
+# Journal
+# ------------------------------------------------------------------------------
+class Journal:
+    """Live files replaced by the last restore run and their originals, so the run can be rolled back or resumed.
+
+    Before a live file is replaced, its original is hardlinked into `originals/`, or renamed beside the target
+    when the journal is on another filesystem and moved into `originals/` once the run ends; neither copies any
+    bytes while the run replaces files. Restores put new content in place with a
+    rename, so the kept inode is never written to. Events are appended to `journal.jsonl` as they happen, so an
+    interrupted run leaves a journal that is complete up to its last replaced file.
+    """
+    path: Path
+    # what the run restores: {"selections": [[op, app]], "strategy": ..., "snapshot": ...}; empty without a journal
+    run: dict
+    # live path → where its original is kept, or None when the run created the file
+    originals: dict[str, str | None]
+    # live paths the run finished writing
+    written: set[str]
+    complete: bool
+    # open while a run is journaled; preserving and finishing do nothing otherwise
+    file: TextIO | None
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+        self._load()
+
+    def _load(self) -> None:
+        self.run, self.originals, self.written, self.complete = {}, {}, set(), False
+        try:
+            lines = (self.path / "journal.jsonl").read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                # last line torn by a killed run
+                break
+            if "run" in event:
+                self.run = event["run"]
+            elif "target" in event:
+                self.originals[event["target"]] = event["original"]
+            elif "written" in event:
+                self.written.add(event["written"])
+            elif "complete" in event:
+                self.complete = True
+
+    def interrupted(self) -> bool:
+        return bool(self.run) and not self.complete
+
+    def begin(self, run: dict) -> None:
+        """Start journaling a new run, dropping the originals kept for the previous one."""
+        self.discard()
+        (self.path / "originals").mkdir(parents=True)
+        self.run = run
+        self.file = open(self.path / "journal.jsonl", "a", encoding="utf-8")
+        self._append({"run": run})
+
+    def resume(self) -> None:
+        """Keep journaling the interrupted run, so originals it already kept aren't overwritten by its own output."""
+        self.file = open(self.path / "journal.jsonl", "a", encoding="utf-8")
+
+    def end(self, complete: bool = True) -> None:
+        """Stop journaling the run. A complete run can be rolled back until the next restore; an incomplete one
+        (cancelled) can also be resumed."""
+        if self.file is None:
+            return
+        self._collect()
+        if complete:
+            self._append({"complete": True})
+            self.complete = True
+        self.file.close()
+        self.file = None
+
+    def _collect(self) -> None:
+        """Move the originals renamed beside their targets into the journal, so none is left in the config dirs."""
+        for index, (target, original) in enumerate(list(self.originals.items())):
+            if original is None or Path(original).is_relative_to(self.path):
+                continue
+            kept = self.path / "originals" / str(index)
+            try:
+                shutil.move(original, kept)
+            except OSError as e:
+                log_error("Failed to move original into the journal", e)
+                continue
+            self.originals[target] = str(kept)
+            self._append({"target": target, "original": str(kept)})
+
+    def discard(self) -> None:
+        for original in self.originals.values():
+            if original is not None and not Path(original).is_relative_to(self.path):
+                Path(original).unlink(missing_ok=True)
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._load()
+
+    def _append(self, event: dict) -> None:
+        # flushed right away, so the journal survives the process being interrupted
+        self.file.write(json.dumps(event) + "\n")
+        self.file.flush()
+
+    def preserve(self, target: Path) -> None:
+        """Keep the original of a live file about to be replaced, the first time the run replaces it."""
+        if self.file is None:
+            return
+        with self.lock:
+            if str(target) in self.originals:
                 return
-            f.seek(-1, os.SEEK_END)
-            if f.read(1) != b"\n":
-                f.write(b"\n")
-    except Exception as e:
-        log_error("Failed to ensure trailing newline", e)
+            original = None
+            if target.is_symlink() or target.exists():
+                if target.is_dir() and not target.is_symlink():
+                    raise IsADirectoryError(f"Is a directory: '{target}'")
+                kept = self.path / "originals" / str(len(self.originals))
+                try:
+                    os.link(target, kept, follow_symlinks=False)
+                except OSError:
+                    kept = target.with_name(f".{target.name}.original")
+                    os.replace(target, kept)
+                original = str(kept)
+            self.originals[str(target)] = original
+            self._append({"target": str(target), "original": original})
+
+    def finish(self, target: Path) -> None:
+        if self.file is None:
+            return
+        with self.lock:
+            self.written.add(str(target))
+            self._append({"written": str(target)})
+
+    def replace(self, temporary: Path, target: Path) -> None:
+        """Rename a fully written file over a live one, keeping the original."""
+        self.preserve(target)
+        os.replace(temporary, target)
+        self.finish(target)
+
+    def restored(self, target: Path) -> bool:
+        """True when the run being resumed already wrote `target`."""
+        return self.file is not None and str(target) in self.written
+
+    def rollback(self) -> bool:
+        """Put back the originals of the last run, newest first, and remove the files it created; False if any failed.
+
+        The journal is kept when something failed, so the rollback can be retried.
+        """
+        failed = False
+        for target, original in reversed(self.originals.items()):
+            try:
+                if original is None:
+                    Path(target).unlink(missing_ok=True)
+                    log(f"{COLOR_YELLOW}del {COLOR_RESET}  {target}")
+                elif os.path.lexists(original):
+                    try:
+                        os.replace(original, target)
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        # moved into the journal from another filesystem: bring it back beside the target first
+                        beside = Path(target).with_name(f".{Path(target).name}.original")
+                        shutil.move(original, beside)
+                        os.replace(beside, target)
+                    log(f"{COLOR_GREEN}undo{COLOR_RESET}  {target}")
+                MANIFEST.forget(Path(target))
+                # the base is what the sync wrote, which this file no longer holds
+                SYNC_STATE.forget(Path(target))
+            except OSError as e:
+                failed = True
+                log_error("Failed to roll back file", e)
+        if not failed:
+            self.discard()
+        return not failed
+
+# ------------------------------------------------------------------------------
+# Sync
+# ------------------------------------------------------------------------------
+class Sync(StrEnum):
+    IN_SYNC       = "in sync"
+    PUSH          = "push"          # changed live: copy it to the backup
+    PULL          = "pull"          # changed in the backup: copy it to the live path
+    DELETE_BACKUP = "delete backup" # deleted live: delete the backup
+    DELETE_LIVE   = "delete live"   # deleted in the backup: delete the live file
+    KEEP          = "keep"          # changed live, but the backup doesn't read the live path (e.g. Cursor): left as is
+    CONFLICT      = "conflict"      # changed on both sides: left as is
+
+class SyncState:
+    """Content of every synced pair when both sides last matched (its base), keyed by live path.
+
+    A side still holding the base did not change since the last sync, so the change on the other side is copied over
+    it; when both changed, the pair is a conflict and neither is touched. Size and mtime are kept with each hash, so
+    files that did not change since the last sync are never read.
+    """
+    path: Path
+    # live path → {"path": backup path, "base": sha256, "live": [size, mtime_ns, sha256], "backup": [...]}
+    entries: dict[str, dict]
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            self.entries = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self) -> None:
+        try:
+            self.path.write_text(json.dumps(self.entries, indent=1, sort_keys=True))
+        except Exception as e:
+            log_error("Failed to save sync state", e)
+
+    def compare(self, live: File, backup: File, push: bool) -> Sync:
+        """What syncing a pair takes; a pair found in sync becomes its new base right away.
+
+        Live changes are only pushed when `push` is set (the backup reads the live path).
+        """
+        base = self.entries.get(str(live), {}).get("base")
+        live_fingerprint, backup_fingerprint = self._fingerprints(live, backup)
+        ours, theirs = live_fingerprint and live_fingerprint[2], backup_fingerprint and backup_fingerprint[2]
+        if ours == theirs:
+            self._record(live, backup, live_fingerprint, backup_fingerprint)
+            return Sync.IN_SYNC
+        if ours == base:
+            return Sync.PULL if theirs is not None else Sync.DELETE_LIVE
+        if theirs == base:
+            if not push:
+                return Sync.KEEP
+            return Sync.PUSH if ours is not None else Sync.DELETE_BACKUP
+        return Sync.CONFLICT
+
+    def settle(self, live: File, backup: File) -> None:
+        """Make a pair just copied or deleted its new base, if both sides match now (they don't when it failed)."""
+        try:
+            live_fingerprint, backup_fingerprint = self._fingerprints(live, backup)
+        except OSError:
+            return
+        if (live_fingerprint and live_fingerprint[2]) == (backup_fingerprint and backup_fingerprint[2]):
+            self._record(live, backup, live_fingerprint, backup_fingerprint)
+
+    def synced_under(self, dir: Path) -> list[Path]:
+        """Paths, relative to a live dir, of the files synced under it before."""
+        return [Path(path).relative_to(dir) for path in self.entries if Path(path).is_relative_to(dir)]
+
+    def forget(self, path: Path) -> None:
+        """Drop the base of the pair a live or backup path belongs to, so the next sync compares its sides afresh."""
+        for live in [live for live, entry in self.entries.items() if str(path) in (live, entry["path"])]:
+            del self.entries[live]
+
+    def _fingerprints(self, live: File, backup: File) -> tuple[list | None, list | None]:
+        """Fingerprints of both sides (the live one of its content as backed up), or None for a missing side.
+
+        Hashes are reused from the last sync, or from the manifest when the pair was just copied.
+        """
+        entry = self.entries.get(str(live), {})
+        pushed, pulled = MANIFEST.entries.get(str(backup), {}), MANIFEST.entries.get(str(live), {})
+        return (
+            _cached_fingerprint(live, [entry.get("live"), pushed.get("source")], backup._transforms()),
+            _cached_fingerprint(backup, [entry.get("backup"), pushed.get("target"), pulled.get("source")]),
+        )
+
+    def _record(self, live: File, backup: File, live_fingerprint: list | None, backup_fingerprint: list | None) -> None:
+        if live_fingerprint is None:
+            # deleted on both sides
+            self.entries.pop(str(live), None)
+            return
+        self.entries[str(live)] = {"path": str(backup), "base": live_fingerprint[2], "live": live_fingerprint, "backup": backup_fingerprint}
+
+def _cached_fingerprint(path: Path, candidates: list[list | None], transforms: tuple[Transform, ...] = ()) -> list | None:
+    """Fingerprint of a file, reusing the first of `candidates` with its size and mtime; None when it is missing."""
+    if not path.is_file():
+        return None
+    stat = path.stat()
+    previous = next((candidate for candidate in candidates if candidate and candidate[:2] == [stat.st_size, stat.st_mtime_ns]), None)
+    return _fingerprint(path, previous, transforms)
+
+def plan_sync(backup: Context, restore: Context) -> None:
+    """Plan the transfers syncing the files of an app's backup and restore in the running context.
+
+    Only files changed on one side are copied (or deleted); conflicts are logged and left untouched.
+    """
+    context = CONTEXT.get()
+    for live, (backup_path, push) in _sync_pairs(backup, restore).items():
+        match SYNC_STATE.compare(live, backup_path, push):
+            case Sync.PUSH:
+                context.plan.append(Transfer(live, backup_path, "file"))
+            case Sync.PULL:
+                context.plan.append(Transfer(backup_path, live, "file"))
+            case Sync.DELETE_BACKUP:
+                context.plan.append(Transfer(live, backup_path, "del"))
+            case Sync.DELETE_LIVE:
+                context.plan.append(Transfer(backup_path, live, "del"))
+            case Sync.CONFLICT:
+                reason = "both changed since the last sync" if str(live) in SYNC_STATE.entries else "they differ and were never synced"
+                log(f"{COLOR_RED}conf{COLOR_RESET}  {live} {COLOR_CYAN}↔{COLOR_RESET} {backup_path}: {reason}")
+                context.conflicts.append(str(live))
+                continue
+            case _:
+                continue
+        context.synced.append((live, backup_path))
+
+def _sync_pairs(backup: Context, restore: Context) -> dict[File, tuple[File, bool]]:
+    """Live path → (backup path, whether live changes are pushed) of every file an app's backup or restore copies.
+
+    Directories are expanded to their files on the sides the operation copies between (only the backup side for
+    restores, which would copy nothing else), plus the files synced under them before, so a file deleted on one side
+    still pairs with its copy on the other. Live paths that are only restored are pulled, never pushed.
+    """
+    pairs: dict[File, tuple[File, bool]] = {}
+    for context, push in ((restore, False), (backup, True)):
+        for transfer in context.plan:
+            for target in transfer.targets:
+                live, backup_path = (transfer.source, target) if push else (target, transfer.source)
+                if transfer.kind != "dir":
+                    pairs[live] = (backup_path, push)
+                    continue
+                sides = (live, backup_path) if push else (backup_path,)
+                relatives = {file.relative_to(side) for side in sides for file in side._walk(context.rules_for(target))}
+                relatives.update(SYNC_STATE.synced_under(live))
+                for relative in relatives:
+                    pairs[live / relative] = (backup_path / relative, push)
+    return pairs
 
 # ------------------------------------------------------------------------------
 # Constants - Directories
@@ -98,23 +1389,42 @@ def _ensure_trailing_newline(path: Path) -> None:
 DOTFILES: File = File(Path(__file__).parent / "dotfiles")
 """Path of local dotfiles directory (relative to this script)."""
 
-UNIX_HOME: File = File(Path.home())
-"""Path of Unix home directory (Linux and Mac)."""
+ROOTS: dict[str, Callable[[], Path]] = {
+    # Unix home directory (Linux and Mac)
+    "UNIX_HOME":       lambda: Path.home(),
+    # Windows home directory
+    "WIN_HOME":        lambda: Path(os.environ.get("USERPROFILE", "")),
+    # Windows AppData/Roaming directory
+    "WIN_ROAMING":     lambda: root("WIN_HOME") / "AppData" / "Roaming",
+    # Windows AppData/Local directory
+    "WIN_LOCAL":       lambda: root("WIN_HOME") / "AppData" / "Local",
+    # Windows Scoop directory; portable apps keep their data under `persist/<app>/`
+    "WIN_SCOOP":       lambda: Path(os.environ.get("SCOOP") or root("WIN_HOME") / "scoop"),
+    # Mac Application Support directory
+    "MAC_APP_SUPPORT": lambda: Path.home() / "Library" / "Application Support",
+}
+"""Directories live configs are found under, resolved on first use so unused (or other platforms') roots cost nothing."""
+
+@functools.cache
+def root(name: str) -> File:
+    return File(ROOTS[name]())
 
-WIN_HOME: File = File(os.environ.get("USERPROFILE", ""))
-"""Path of Windows home directory."""
+def live_path(path: str) -> File:
+    """Resolve a live path written as `<ROOT>/relative/path`."""
+    name, _, relative = path.partition("/")
+    return root(name) / relative if relative else root(name)
 
-WIN_ROAMING: File = WIN_HOME / "AppData" / "Roaming"
-"""Path of Windows AppData/Roaming directory."""
+MANIFEST: Manifest = Manifest(Path(__file__).parent / ".dotfiles-manifest.json")
+"""Per-machine record of copied files, used to skip files that did not change since the last run."""
 
-WIN_LOCAL: File = WIN_HOME / "AppData" / "Local"
-"""Path of Windows AppData/Local directory."""
+STORE: Store = Store(Path(__file__).parent / ".dotfiles-store")
+"""Local history of backups, written by `backup --snapshot` and read by `restore --from`."""
 
-WIN_SCOOP: File = File(os.environ.get("SCOOP") or WIN_HOME / "scoop")
-"""Path of Windows Scoop directory; portable apps keep their data under `persist/<app>/`."""
+JOURNAL: Journal = Journal(Path(__file__).parent / ".dotfiles-journal")
+"""Originals replaced by the last restore or sync, read by `rollback` and `resume`."""
 
-MAC_APP_SUPPORT: File = File(Path.home() / "Library" / "Application Support")
-"""Path of Mac Application Support directory."""
+SYNC_STATE: SyncState = SyncState(Path(__file__).parent / ".dotfiles-sync.json")
+"""Per-machine base of every synced pair, read by `sync` to tell which side changed."""
 
 # ------------------------------------------------------------------------------
 # Functions - Log
@@ -125,17 +1435,67 @@ COLOR_GREEN  = "\033[92m"
 COLOR_YELLOW = "\033[93m"
 COLOR_CYAN   = "\033[96m"
 
-def log_transfer(kind: str, source: Path, target: Path) -> None:
+def log(line: str) -> None:
+    """Print a log line, or buffer it in the running operation so its lines stay grouped."""
+    context = CONTEXT.get(None)
+    if context is not None:
+        context.logs.append(line)
+        return
+    with PRINT_LOCK:
+        _print_log(line)
+
+def _print_log(line: str) -> None:
+    """Print a log line, or keep it back in `HELD_LOGS`; called holding `PRINT_LOCK`."""
+    if HELD_LOGS is not None:
+        HELD_LOGS.append(line)
+        return
     print("")
-    print(f"{COLOR_GREEN}{kind:<4}{COLOR_RESET}  {source} {COLOR_CYAN}→{COLOR_RESET} {target}")
+    print(line)
+
+QUIET = False
+"""When True, per-transfer lines are not printed (errors and summaries still are)."""
+
+def log_transfer(kind: str, source: Path, target: Path) -> None:
+    if not QUIET:
+        log(f"{COLOR_GREEN}{kind:<4}{COLOR_RESET}  {source} {COLOR_CYAN}→{COLOR_RESET} {target}")
 
 def log_error(message: str, exception: Exception) -> None:
-    print("")
-    print(f"{COLOR_RED}err {COLOR_RESET}  {message}: {exception}")
+    context = CONTEXT.get(None)
+    if context is not None:
+        context.errors += 1
+    log(f"{COLOR_RED}err {COLOR_RESET}  {message}: {exception}")
 
 def log_unsupported(item: str) -> None:
-    print("")
-    print(f"{COLOR_YELLOW}skip{COLOR_RESET}  {item}: unsupported on {SYSTEM}")
+    context = CONTEXT.get(None)
+    if context is not None:
+        context.unsupported = True
+    log(f"{COLOR_YELLOW}skip{COLOR_RESET}  {item}: unsupported on {SYSTEM}")
+
+def log_summary(contexts: list["Context"]) -> None:
+    """Print a table with the metrics of each operation and their totals."""
+    rows = [(context.name, context.elapsed * 1000, context.examined, context.written, context.skipped, context.bytes_written, context.errors) for context in contexts]
+    rows.append(("total", *(sum(row[i] for row in rows) for i in range(1, 7))))
+    lines = [f"{'operation':<26} {'ms':>8} {'files':>6} {'written':>8} {'skipped':>8} {'bytes':>10} {'errors':>6}"]
+    for name, ms, examined, written, skipped, size, errors in rows:
+        color = COLOR_RED if errors else COLOR_RESET
+        lines.append(f"{name:<26} {ms:8.1f} {examined:6} {written:8} {skipped:8} {format_bytes(size):>10} {color}{errors:6}{COLOR_RESET}")
+    excluded = [(path, reason) for context in contexts for path, reason in context.excluded]
+    if excluded:
+        lines.append("")
+        lines.append(f"{len(excluded)} paths excluded by copy rules:")
+        lines.extend(f"  {path}: {reason}" for path, reason in excluded)
+    conflicts = [path for context in contexts for path in context.conflicts]
+    if conflicts:
+        lines.append("")
+        lines.append(f"{COLOR_RED}{len(conflicts)} conflicts{COLOR_RESET}, changed live and in the backup (run backup or restore to pick a side):")
+        lines.extend(f"  {path}" for path in conflicts)
+    log(f"{COLOR_CYAN}done{COLOR_RESET}\n" + "\n".join(lines))
+
+def write_report(path: Path, contexts: list["Context"]) -> None:
+    """Write the metrics of each operation as JSON."""
+    operations = [context.metrics() for context in contexts]
+    totals = {key: sum(operation[key] for operation in operations) for key in ("seconds", "examined", "written", "skipped", "bytes_written", "errors")}
+    path.write_text(json.dumps({"operations": operations, "totals": totals}, indent=2))
 
 # ------------------------------------------------------------------------------
 # Platform
@@ -150,93 +1510,263 @@ SYSTEM = OS(platform.system())
 class Op(StrEnum):
     BACKUP  = "Backup"
     RESTORE = "Restore"
+    SYNC    = "Sync"
 
 # ------------------------------------------------------------------------------
 # Decorator
 # ------------------------------------------------------------------------------
-def operation(app: str, dir: str, subdir: bool = False):
+def operation(app: str, dir: str, subdir: bool = False, restore: Strategy = Strategy.COPY):
     """Wrap a backup/restore function, injecting the app name and the resolved `dotfiles/<target_dir>` path.
 
     Set `subdir=True` for apps whose backup lives one level deeper (e.g. JetBrains, where each tool has
     its own subdir under `dotfiles/jetbrains/` that must be preserved when the tool isn't installed on
     the current machine).
+
+    Set `restore` to put restored files in place as links into the dotfiles dir instead of copies;
+    `--strategy` overrides it for a whole run.
     """
     def decorator(fn):
         @functools.wraps(fn)
-        def wrapper(*args, **kwargs):
-            File._subdir = subdir
+        def wrapper(*args, **kwargs) -> Context:
+            context = Context(app, fn.__name__, subdir, restore, app_rules(app))
+            token = CONTEXT.set(context)
+            start = time.perf_counter()
             try:
-                return fn(app, DOTFILES / dir, *args, **kwargs)
+                fn(app, DOTFILES / dir, *args, **kwargs)
             finally:
-                File._subdir = False
+                context.elapsed += time.perf_counter() - start
+                CONTEXT.reset(token)
+            return context
         return wrapper
     return decorator
 
 # ------------------------------------------------------------------------------
-# Items - Claude Code
+# Plan
 # ------------------------------------------------------------------------------
-@operation("Claude Code", "claude-code")
-def backup_claude_code(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            WIN_HOME / ".claude/settings.json" >> dir / "settings.json"
-            WIN_HOME / ".claude/CLAUDE.md" >> dir / "CLAUDE.md"
-        case OS.LINUX | OS.MAC:
-            UNIX_HOME / ".claude/settings.json" >> dir / "settings.json"
-            UNIX_HOME / ".claude/CLAUDE.md" >> dir / "CLAUDE.md"
-
-@operation("Claude Code", "claude-code")
-def restore_claude_code(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            dir / "settings.json" >> WIN_HOME / ".claude/settings.json"
-            dir / "CLAUDE.md" >> WIN_HOME / ".claude/CLAUDE.md"
-        case OS.LINUX | OS.MAC:
-            dir / "settings.json" >> UNIX_HOME / ".claude/settings.json"
-            dir / "CLAUDE.md" >> UNIX_HOME / ".claude/CLAUDE.md"
+def plan_operations(handlers: list[Callable[[], Context]], strategy: Strategy | None = None) -> list[Context]:
+    """Run handlers to collect their transfers, then optimize the combined plan.
 
-# ------------------------------------------------------------------------------
-# Items - Ghostty
-# ------------------------------------------------------------------------------
-@operation("Ghostty", "ghostty")
-def backup_ghostty(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            log_unsupported(app)
-        case OS.LINUX | OS.MAC:
-            UNIX_HOME / ".config/ghostty/config" >> dir / "config"
+    Repeated targets are kept once, file transfers already covered by a directory transfer are dropped,
+    transfers of one source to several targets are merged so the source is read once, and each plan is
+    ordered by device so transfers touching the same disk run back to back. Operations stay in the order of
+    `handlers`, so e.g. a backup selected before a restore of the same files runs first.
+    `strategy` overrides the restore strategy of every operation.
+    """
+    contexts = [handler() for handler in handlers]
+    for context in contexts:
+        context.strategy = strategy or context.strategy
+    dirs = [transfer for context in contexts for transfer in context.plan if transfer.kind == "dir"]
+    seen: set[File] = set()
+    for context in contexts:
+        plan: dict[tuple[File, str, bool], Transfer] = {}
+        for transfer in context.plan:
+            if transfer.target in seen or _covered_by(transfer, dirs):
+                continue
+            seen.add(transfer.target)
+            key = (transfer.source, transfer.kind, transfer.optional)
+            plan[key] = plan[key]._replace(also=(*plan[key].also, transfer.target)) if key in plan else transfer
+        context.plan = sorted(plan.values(), key=lambda transfer: (_device(transfer.target), _device(transfer.source)))
+    return contexts
 
-@operation("Ghostty", "ghostty")
-def restore_ghostty(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            log_unsupported(app)
-        case OS.LINUX | OS.MAC:
-            dir >> UNIX_HOME / ".config/ghostty"
+def execute_plans(contexts: list[Context], jobs: int = 1) -> None:
+    """Execute planned transfers, up to `jobs` operations at a time. Each operation has its own `Context`.
+
+    Operations of the same app (e.g. its backup and restore) share its dotfiles dir, which a backup swaps while the
+    others may be reading it, so they run one after another, in order, on the same worker.
+    """
+    if jobs <= 1:
+        for context in contexts:
+            context.execute()
+        return
+    groups: dict[str, list[Context]] = {}
+    for context in contexts:
+        groups.setdefault(context.app, []).append(context)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(_execute_in_order, groups.values()))
+
+def _execute_in_order(contexts: list[Context]) -> None:
+    for context in contexts:
+        context.execute()
+
+def print_plans(contexts: list[Context]) -> None:
+    """Print planned transfers and their total size without touching disk."""
+    total = count = 0
+    for context in contexts:
+        for transfer in context.plan:
+            if transfer.optional and not transfer.source.exists():
+                continue
+            size = transfer.size(context.rules_for(transfer.target))
+            total += size
+            count += 1
+            targets = ", ".join(map(str, transfer.targets))
+            if transfer.kind == "del":
+                log(f"{COLOR_YELLOW}del {COLOR_RESET}  {targets}")
+            else:
+                log(f"{COLOR_GREEN}{transfer.kind:<4}{COLOR_RESET}  {transfer.source} {COLOR_CYAN}→{COLOR_RESET} {targets}  ({format_bytes(size)})")
+        context.flush()
+    log(f"{COLOR_CYAN}plan{COLOR_RESET}  {count} transfers, {format_bytes(total)}")
+
+def _covered_by(transfer: Transfer, dirs: list[Transfer]) -> bool:
+    """True when a file transfer is already performed by one of the directory transfers."""
+    if transfer.kind != "file":
+        return False
+    for dir in dirs:
+        if transfer.source.is_relative_to(dir.source) and transfer.target == dir.target / transfer.source.relative_to(dir.source):
+            return True
+    return False
+
+def _device(path: Path) -> int:
+    """Device id of the path, or of its closest existing parent."""
+    for candidate in (path, *path.parents):
+        try:
+            return candidate.stat().st_dev
+        except OSError:
+            continue
+    return -1
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
 
 # ------------------------------------------------------------------------------
-# Items - Helix
+# Apps
 # ------------------------------------------------------------------------------
-@operation("Helix", "helix")
-def backup_helix(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            WIN_ROAMING / "helix/config.toml" >> dir / "config.toml"
-            WIN_ROAMING / "helix/languages.toml" >> dir / "languages.toml"
-        case OS.LINUX | OS.MAC:
-            UNIX_HOME / ".config/helix/config.toml" >> dir / "config.toml"
-            UNIX_HOME / ".config/helix/languages.toml" >> dir / "languages.toml"
-
-@operation("Helix", "helix")
-def restore_helix(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            dir >> WIN_ROAMING / "helix"
-        case OS.LINUX | OS.MAC:
-            dir >> UNIX_HOME / ".config/helix"
+EXCLUDE = (".DS_Store", "Thumbs.db", "*.log", "*.tmp", "*.swp", "Cache", "CachedData", "GPUCache", "logs")
+"""Globs excluded from the directory backups of every app; caches and logs are never worth backing up.
+
+Restores copy whatever the backup holds, so files backed up before a glob was added are still restored.
+"""
+
+MAX_FILE_SIZE = 5 * 1024 * 1024
+"""Files over this size are skipped by directory backups unless an app sets its own `max_size`."""
+
+class App(NamedTuple):
+    """An entry of the picker; its files are described by `MAPPINGS`, or by custom handlers in `CUSTOM_HANDLERS`."""
+    name: str
+    category: str
+    dir: str # backup dir, under dotfiles/
+    subdir: bool = False # see `operation`
+    restore: Strategy = Strategy.COPY # see `operation`
+    include: tuple[str, ...] = () # see `Rules`
+    exclude: tuple[str, ...] = () # see `Rules`; backups also exclude `EXCLUDE`
+    max_size: int | None = None # see `Rules`; backups default to `MAX_FILE_SIZE`
+
+    def rules(self) -> Rules:
+        return Rules(self.include, self.exclude, self.max_size)
+
+class Mapping(NamedTuple):
+    """A row of the mapping table: what an app copies between a live path and its backup dir, on which systems and operations."""
+    app: str
+    systems: tuple[OS, ...]
+    ops: tuple[Op, ...]
+    kind: str # "file" or "dir"
+    live: str # `<ROOT>/relative/path`, see `ROOTS`
+    repo: str # relative to dotfiles/<dir>/; empty for the backup dir itself
+
+UNIX    = (OS.LINUX, OS.MAC)
+LINUX   = (OS.LINUX,)
+MAC     = (OS.MAC,)
+WIN     = (OS.WIN,)
+BOTH    = (Op.BACKUP, Op.RESTORE)
+BACKUP  = (Op.BACKUP,)
+RESTORE = (Op.RESTORE,)
+
+APPS: tuple[App, ...] = (
+    App("Claude Code",      "AI",       "claude-code"),
+    App("Ghostty",          "Terminal", "ghostty"),
+    App("PowerShell",       "Terminal", "powershell"),
+    App("Starship",         "Terminal", "starship"),
+    App("Warp",             "Terminal", "warp"),
+    App("Windows Terminal", "Terminal", "windows-terminal", exclude=("state.json", "elevated-state.json")),
+    App("Helix",            "Editor",   "helix"),
+    App("JetBrains",        "Editor",   "jetbrains", subdir=True),
+    App("RStudio",          "Editor",   "rstudio"),
+    App("VIM",              "Editor",   "vim"),
+    App("VSCode / Cursor",  "Editor",   "vscode",           exclude=("workspaceStorage", "globalStorage", "History")),
+    App("Notable",          "Notes",    "notable"),
+)
+"""Apps in picker order, grouped by category."""
+
+MAPPINGS: tuple[Mapping, ...] = (
+    Mapping("Claude Code",      WIN,  BOTH,    "file", "WIN_HOME/.claude/settings.json",                                                  "settings.json"),
+    Mapping("Claude Code",      WIN,  BOTH,    "file", "WIN_HOME/.claude/CLAUDE.md",                                                      "CLAUDE.md"),
+    Mapping("Claude Code",      UNIX, BOTH,    "file", "UNIX_HOME/.claude/settings.json",                                                 "settings.json"),
+    Mapping("Claude Code",      UNIX, BOTH,    "file", "UNIX_HOME/.claude/CLAUDE.md",                                                     "CLAUDE.md"),
+    Mapping("Ghostty",          UNIX, BACKUP,  "file", "UNIX_HOME/.config/ghostty/config",                                                "config"),
+    Mapping("Ghostty",          UNIX, RESTORE, "dir",  "UNIX_HOME/.config/ghostty",                                                       ""),
+    Mapping("Helix",            WIN,  BACKUP,  "file", "WIN_ROAMING/helix/config.toml",                                                   "config.toml"),
+    Mapping("Helix",            WIN,  BACKUP,  "file", "WIN_ROAMING/helix/languages.toml",                                                "languages.toml"),
+    Mapping("Helix",            WIN,  RESTORE, "dir",  "WIN_ROAMING/helix",                                                               ""),
+    Mapping("Helix",            UNIX, BACKUP,  "file", "UNIX_HOME/.config/helix/config.toml",                                             "config.toml"),
+    Mapping("Helix",            UNIX, BACKUP,  "file", "UNIX_HOME/.config/helix/languages.toml",                                          "languages.toml"),
+    Mapping("Helix",            UNIX, RESTORE, "dir",  "UNIX_HOME/.config/helix",                                                         ""),
+    Mapping("Notable",          WIN,  BOTH,    "file", "WIN_HOME/.notable.json",                                                          ".notable.json"),
+    Mapping("PowerShell",       WIN,  BOTH,    "file", "WIN_HOME/Documents/PowerShell/Microsoft.PowerShell_profile.ps1",                  "Microsoft.PowerShell_profile.ps1"),
+    Mapping("RStudio",          WIN,  BACKUP,  "file", "WIN_ROAMING/RStudio/config.json",                                                 "config.json"),
+    Mapping("RStudio",          WIN,  BACKUP,  "dir",  "WIN_ROAMING/RStudio/keybindings",                                                 "keybindings"),
+    Mapping("RStudio",          WIN,  RESTORE, "dir",  "WIN_ROAMING/RStudio",                                                             ""),
+    Mapping("Starship",         UNIX, BOTH,    "file", "UNIX_HOME/.config/starship.toml",                                                 "starship.toml"),
+    Mapping("VIM",              UNIX, BOTH,    "file", "UNIX_HOME/.vimrc",                                                                ".vimrc"),
+    # Scoop installs VSCode as a portable app, so its config lives under persist/ instead of %AppData%\Code.
+    Mapping("VSCode / Cursor",  WIN,   BACKUP,  "file", "WIN_SCOOP/persist/vscode/data/user-data/User/keybindings.json",                  "keybindings.json"),
+    Mapping("VSCode / Cursor",  WIN,   BACKUP,  "file", "WIN_SCOOP/persist/vscode/data/user-data/User/settings.json",                     "settings.json"),
+    Mapping("VSCode / Cursor",  WIN,   RESTORE, "dir",  "WIN_SCOOP/persist/vscode/data/user-data/User",                                   ""),
+    Mapping("VSCode / Cursor",  WIN,   RESTORE, "dir",  "WIN_ROAMING/Cursor/User",                                                        ""),
+    Mapping("VSCode / Cursor",  LINUX, BACKUP,  "file", "UNIX_HOME/.config/Code/User/keybindings.json",                                   "keybindings.json"),
+    Mapping("VSCode / Cursor",  LINUX, BACKUP,  "file", "UNIX_HOME/.config/Code/User/settings.json",                                      "settings.json"),
+    Mapping("VSCode / Cursor",  LINUX, RESTORE, "dir",  "UNIX_HOME/.config/Code/User",                                                    ""),
+    Mapping("VSCode / Cursor",  LINUX, RESTORE, "dir",  "UNIX_HOME/.config/Cursor/User",                                                  ""),
+    Mapping("VSCode / Cursor",  MAC,   BACKUP,  "file", "MAC_APP_SUPPORT/Code/User/keybindings.json",                                     "keybindings.json"),
+    Mapping("VSCode / Cursor",  MAC,   BACKUP,  "file", "MAC_APP_SUPPORT/Code/User/settings.json",                                        "settings.json"),
+    Mapping("VSCode / Cursor",  MAC,   RESTORE, "dir",  "MAC_APP_SUPPORT/Code/User",                                                      ""),
+    Mapping("VSCode / Cursor",  MAC,   RESTORE, "dir",  "MAC_APP_SUPPORT/Cursor/User",                                                    ""),
+    Mapping("Warp",             UNIX, BACKUP,  "file", "UNIX_HOME/.warp/keybindings.yaml",                                                "keybindings.yaml"),
+    Mapping("Warp",             UNIX, BACKUP,  "file", "UNIX_HOME/.warp/settings.toml",                                                   "settings.toml"),
+    Mapping("Warp",             UNIX, RESTORE, "dir",  "UNIX_HOME/.warp",                                                                 ""),
+    Mapping("Windows Terminal", WIN,  BACKUP,  "file", "WIN_LOCAL/Packages/Microsoft.WindowsTerminal_8wekyb3d8bbwe/LocalState/settings.json", "settings.json"),
+    Mapping("Windows Terminal", WIN,  RESTORE, "dir",  "WIN_LOCAL/Packages/Microsoft.WindowsTerminal_8wekyb3d8bbwe/LocalState",           ""),
+)
+"""Every file each app copies. Paths are plain strings and only resolved when the app's handler runs."""
+
+APPS_BY_NAME: dict[str, App] = {app.name: app for app in APPS}
+
+MAPPINGS_BY_APP: dict[str, list[Mapping]] = {}
+for mapping in MAPPINGS:
+    MAPPINGS_BY_APP.setdefault(mapping.app, []).append(mapping)
+
+def mappings(app: str, op: Op, system: OS | None = None) -> list[Mapping]:
+    """Rows of the mapping table for an app and operation on `system` (default: this one)."""
+    return [mapping for mapping in MAPPINGS_BY_APP.get(app, []) if op in mapping.ops and (system or SYSTEM) in mapping.systems]
+
+def _mapped_handler(app: App, op: Op) -> Callable[[], Context]:
+    """Backup/restore handler generated from the mapping table."""
+    def handler(name: str, dir: File):
+        rows = mappings(name, op)
+        if not rows:
+            log_unsupported(name)
+        for row in rows:
+            live, repo = live_path(row.live), dir / row.repo if row.repo else dir
+            source, target = (live, repo) if op == Op.BACKUP else (repo, live)
+            CONTEXT.get().plan.append(Transfer(source, target, row.kind))
+    handler.__name__ = f"{op.lower()}_{app.dir.replace('-', '_')}"
+    return operation(app.name, app.dir, app.subdir, app.restore)(handler)
+
+def _sync_handler(app: App, handlers: dict[Op, Callable[[], Context]]) -> Callable[[], Context]:
+    """Sync handler of an app, pairing the files copied by its backup and restore handlers."""
+    def handler(name: str, dir: File):
+        backup, restore = handlers[Op.BACKUP](), handlers[Op.RESTORE]()
+        # both log it when the app is unsupported here
+        for line in dict.fromkeys(backup.logs + restore.logs):
+            log(line)
+        CONTEXT.get().in_place = True
+        plan_sync(backup, restore)
+    handler.__name__ = f"sync_{app.dir.replace('-', '_')}"
+    return operation(app.name, app.dir, app.subdir, app.restore)(handler)
 
 # ------------------------------------------------------------------------------
-# Items - JetBrains
+# Custom handlers - JetBrains
 # ------------------------------------------------------------------------------
 JETBRAINS_TOOLS = (
     "CLion",
@@ -268,246 +1798,453 @@ JETBRAINS_FILES = (
     # "options/window.layouts.xml",
 )
 
-def jetbrains_installs() -> dict[str, File]:
-    """Latest install folder for each installed JetBrains tool."""
+class JetBrainsInstall(NamedTuple):
+    """Latest install folder of a JetBrains tool and which of `JETBRAINS_FILES` it contains."""
+    version: tuple[int, ...]
+    path: File
+    files: tuple[str, ...]
+
+JETBRAINS_INSTALL_PATTERN = re.compile(rf"({'|'.join(JETBRAINS_TOOLS)})(\d+(?:\.\d+)*)")
+
+@functools.cache
+def jetbrains_installs() -> dict[str, JetBrainsInstall]:
+    """Latest install of each installed JetBrains tool, by version number (so 2024.10 wins over 2024.9).
+
+    Built with a single scan of the JetBrains config dir and cached for the rest of the run, so backup and restore share it.
+    """
     match SYSTEM:
         case OS.WIN:
-            root = WIN_ROAMING / "JetBrains"
+            dir = root("WIN_ROAMING") / "JetBrains"
         case OS.MAC:
-            root = MAC_APP_SUPPORT / "JetBrains"
+            dir = root("MAC_APP_SUPPORT") / "JetBrains"
         case OS.LINUX:
-            root = UNIX_HOME / ".config/JetBrains"
-    installs: dict[str, File] = {}
+            dir = root("UNIX_HOME") / ".config/JetBrains"
+    latest: dict[str, tuple[tuple[int, ...], str]] = {}
+    try:
+        with os.scandir(dir) as entries:
+            for entry in entries:
+                match = JETBRAINS_INSTALL_PATTERN.fullmatch(entry.name)
+                if not match or not entry.is_dir():
+                    continue
+                tool, version = match[1], tuple(int(part) for part in match[2].split("."))
+                if tool not in latest or version > latest[tool][0]:
+                    latest[tool] = (version, entry.path)
+    except OSError:
+        return {}
+    installs: dict[str, JetBrainsInstall] = {}
     for tool in JETBRAINS_TOOLS:
-        versions = sorted(root.glob(f"{tool}[0-9]*"))
-        if versions:
-            installs[tool] = File(versions[-1])
+        if tool in latest:
+            version, path = latest[tool]
+            installs[tool] = JetBrainsInstall(version, File(path), jetbrains_files(Path(path)))
     return installs
 
+def jetbrains_files(dir: Path) -> tuple[str, ...]:
+    """Which of `JETBRAINS_FILES` exist under `dir`, scanning each parent folder once instead of stating every file."""
+    present: dict[str, set[str]] = {}
+    for file in JETBRAINS_FILES:
+        parent = os.path.dirname(file)
+        if parent not in present:
+            try:
+                with os.scandir(dir / parent) as entries:
+                    present[parent] = {entry.name for entry in entries}
+            except OSError:
+                present[parent] = set()
+    return tuple(file for file in JETBRAINS_FILES if os.path.basename(file) in present[os.path.dirname(file)])
+
 @operation("JetBrains", "jetbrains", subdir=True)
 def backup_jetbrains(app: str, dir: File):
     for tool, install in jetbrains_installs().items():
-        for file in JETBRAINS_FILES:
-            source = install / file
-            if not source.exists():
-                continue
-            source >> dir / tool / file
+        for file in install.files:
+            install.path / file >> dir / tool / file
 
 @operation("JetBrains", "jetbrains")
 def restore_jetbrains(app: str, dir: File):
+    # every file a backup may hold is mapped, so `import` can place them without a dotfiles dir to scan
     for tool, install in jetbrains_installs().items():
         for file in JETBRAINS_FILES:
             source = dir / tool / file
-            if not source.exists():
-                continue
-            source >> install / file
+            CONTEXT.get().plan.append(Transfer(source, install.path / file, "dir" if source.is_dir() else "file", optional=True))
 
 # ------------------------------------------------------------------------------
-# Items - Notable
+# Registry
 # ------------------------------------------------------------------------------
-@operation("Notable", "notable")
-def backup_notable(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            WIN_HOME / ".notable.json" >> dir / ".notable.json"
-        case OS.LINUX | OS.MAC:
-            log_unsupported(app)
+CUSTOM_HANDLERS: dict[str, dict[Op, Callable[[], Context]]] = {
+    "JetBrains": {Op.BACKUP: backup_jetbrains, Op.RESTORE: restore_jetbrains},
+}
+"""Apps whose files can't be described by a fixed table."""
 
-@operation("Notable", "notable")
-def restore_notable(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            dir / ".notable.json" >> WIN_HOME / ".notable.json"
-        case OS.LINUX | OS.MAC:
-            log_unsupported(app)
+REGISTRY_BY_CATEGORY: dict[str, dict[str, dict[Op, Callable[[], Context]]]] = {}
+for app in APPS:
+    handlers = CUSTOM_HANDLERS.get(app.name) or {op: _mapped_handler(app, op) for op in (Op.BACKUP, Op.RESTORE)}
+    REGISTRY_BY_CATEGORY.setdefault(app.category, {})[app.name] = {**handlers, Op.SYNC: _sync_handler(app, handlers)}
 
-# ------------------------------------------------------------------------------
-# Items - PowerShell
-# ------------------------------------------------------------------------------
-@operation("PowerShell", "powershell")
-def backup_powershell(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            WIN_HOME / "Documents/PowerShell/Microsoft.PowerShell_profile.ps1" >> dir / "Microsoft.PowerShell_profile.ps1"
-        case OS.LINUX | OS.MAC:
-            log_unsupported(app)
+REGISTRY_BY_APP: dict[str, dict[Op, Callable[[], Context]]] = {
+    app: handlers
+    for category in REGISTRY_BY_CATEGORY.values()
+    for app, handlers in category.items()
+}
 
-@operation("PowerShell", "powershell")
-def restore_powershell(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            dir / "Microsoft.PowerShell_profile.ps1" >> WIN_HOME / "Documents/PowerShell/Microsoft.PowerShell_profile.ps1"
-        case OS.LINUX | OS.MAC:
-            log_unsupported(app)
+def select_apps(names: list[str]) -> list[str]:
+    """Apps matching the given names, in registry order.
 
-# ------------------------------------------------------------------------------
-# Items - RStudio
-# ------------------------------------------------------------------------------
-@operation("RStudio", "rstudio")
-def backup_rstudio(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            WIN_ROAMING / "RStudio/config.json" >> dir / "config.json"
-            WIN_ROAMING / "RStudio/keybindings" >> dir / "keybindings"
-        case OS.LINUX | OS.MAC:
-            log_unsupported(app)
+    A name matches a category (all its apps), an app, or a word of an app name, ignoring case and punctuation
+    (`vscode` and `cursor` both match "VSCode / Cursor"). Raises `KeyError` for names that match nothing.
+    """
+    selected: set[str] = set()
+    for name in names:
+        matches = {
+            app
+            for category, apps in REGISTRY_BY_CATEGORY.items()
+            for app in apps
+            if _normalize(name) in (_normalize(category), _normalize(app), *map(_normalize, re.split(r"[\s/]+", app)))
+        }
+        if not matches:
+            raise KeyError(name)
+        selected |= matches
+    return [app for app in REGISTRY_BY_APP if app in selected]
 
-@operation("RStudio", "rstudio")
-def restore_rstudio(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            dir >> WIN_ROAMING / "RStudio"
-        case OS.LINUX | OS.MAC:
-            log_unsupported(app)
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
 
 # ------------------------------------------------------------------------------
-# Items - Starship
+# Status
 # ------------------------------------------------------------------------------
-@operation("Starship", "starship")
-def backup_starship(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            log_unsupported(app)
-        case OS.LINUX | OS.MAC:
-            UNIX_HOME / ".config/starship.toml" >> dir / "starship.toml"
+class Drift(StrEnum):
+    IN_SYNC       = "in sync"
+    CHANGED       = "changed"
+    MISSING       = "missing"
+    REPO_ONLY     = "repo-only"
+    ERROR         = "error"
+    NOT_INSTALLED = "not installed" # nothing of the app found on this machine (e.g. no JetBrains IDE)
+    UNSUPPORTED   = "unsupported"   # the app has no files on this system
 
-@operation("Starship", "starship")
-def restore_starship(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            log_unsupported(app)
-        case OS.LINUX | OS.MAC:
-            dir / "starship.toml" >> UNIX_HOME / ".config/starship.toml"
+class AppStatus(NamedTuple):
+    """Drift between an app's live config and its backup; `files` lists the paths that are not in sync."""
+    app: str
+    drift: Drift
+    changed_bytes: int
+    files: list[tuple[Drift, Path]]
 
-# ------------------------------------------------------------------------------
-# Items - VIM
-# ------------------------------------------------------------------------------
-@operation("VIM", "vim")
-def backup_vim(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            log_unsupported(app)
-        case OS.LINUX | OS.MAC:
-            UNIX_HOME / ".vimrc" >> dir / ".vimrc"
+    def marker(self) -> str:
+        match self.drift:
+            case Drift.IN_SYNC:
+                return "✓"
+            case Drift.CHANGED:
+                return f"~{format_bytes(self.changed_bytes)}"
+            case Drift.MISSING:
+                return "! missing"
+            case Drift.REPO_ONLY:
+                return "+ repo"
+            case Drift.ERROR:
+                return "! error"
+        return ""
 
-@operation("VIM", "vim")
-def restore_vim(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            log_unsupported(app)
-        case OS.LINUX | OS.MAC:
-            dir / ".vimrc" >> UNIX_HOME / ".vimrc"
+def scan_status(apps: list[str], jobs: int = 8, on_status: Callable[[AppStatus], None] | None = None) -> list[AppStatus]:
+    """Compare every live path read by the apps' backups with its copy in the dotfiles dir, hashing files in parallel.
 
-# ------------------------------------------------------------------------------
-# Items - VSCode / Cursor
-# ------------------------------------------------------------------------------
-@operation("VSCode / Cursor", "vscode")
-def backup_vscode(app: str, dir: File):
-    # Scoop installs VSCode as a portable app, so its config lives under persist/ instead of %AppData%\Code.
-    match SYSTEM:
-        case OS.WIN:
-            WIN_SCOOP / "persist/vscode/data/user-data/User/keybindings.json" >> dir / "keybindings.json"
-            WIN_SCOOP / "persist/vscode/data/user-data/User/settings.json" >> dir / "settings.json"
-        case OS.LINUX:
-            UNIX_HOME / ".config/Code/User/keybindings.json" >> dir / "keybindings.json"
-            UNIX_HOME / ".config/Code/User/settings.json" >> dir / "settings.json"
-        case OS.MAC:
-            MAC_APP_SUPPORT / "Code/User/keybindings.json" >> dir / "keybindings.json"
-            MAC_APP_SUPPORT / "Code/User/settings.json" >> dir / "settings.json"
+    `on_status` is called with each app's status as soon as it is known. Nothing is written.
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        statuses = []
+        contexts = plan_operations([REGISTRY_BY_APP[app][Op.BACKUP] for app in apps])
+        for context in sorted(contexts, key=lambda context: apps.index(context.app)):
+            status = _app_status(context, executor)
+            statuses.append(status)
+            if on_status:
+                on_status(status)
+    return statuses
 
-@operation("VSCode / Cursor", "vscode")
-def restore_vscode(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            dir >> WIN_SCOOP / "persist/vscode/data/user-data/User"
-            dir >> WIN_ROAMING / "Cursor/User"
-        case OS.LINUX:
-            dir >> UNIX_HOME / ".config/Code/User"
-            dir >> UNIX_HOME / ".config/Cursor/User"
-        case OS.MAC:
-            dir >> MAC_APP_SUPPORT / "Code/User"
-            dir >> MAC_APP_SUPPORT / "Cursor/User"
+def _app_status(context: Context, executor: ThreadPoolExecutor) -> AppStatus:
+    if not context.plan:
+        return AppStatus(context.app, Drift.UNSUPPORTED if context.unsupported else Drift.NOT_INSTALLED, 0, [])
+    token = CONTEXT.set(context)
+    try:
+        pairs: list[tuple[File, File]] = []
+        for transfer in context.plan:
+            for target in transfer.targets:
+                if transfer.kind == "file":
+                    pairs.append((transfer.source, target))
+                else:
+                    pairs.extend((source, target / source.relative_to(transfer.source)) for source in transfer.source._walk(context.rules_for(target)))
+        roots = {target._dotfiles_root() for _, target in pairs}
+    finally:
+        CONTEXT.reset(token)
 
-# ------------------------------------------------------------------------------
-# Items - Warp
-# ------------------------------------------------------------------------------
-@operation("Warp", "warp")
-def backup_warp(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            log_unsupported(app)
-        case OS.LINUX | OS.MAC:
-            UNIX_HOME / ".warp/keybindings.yaml" >> dir / "keybindings.yaml"
-            UNIX_HOME / ".warp/settings.toml" >> dir / "settings.toml"
+    files = [(drift, source, size) for drift, source, size in executor.map(lambda pair: _pair_drift(*pair), pairs) if drift != Drift.IN_SYNC]
+    covered = {target for _, target in pairs}
+    files += [(Drift.REPO_ONLY, path, 0) for root in roots for path in map(File, (root / relative for relative in _tree(root))) if path not in covered]
+    drifts = {drift for drift, _, _ in files}
+    drift = next((drift for drift in (Drift.ERROR, Drift.CHANGED, Drift.MISSING, Drift.REPO_ONLY) if drift in drifts), Drift.IN_SYNC)
+    return AppStatus(context.app, drift, sum(size for _, _, size in files), [(drift, path) for drift, path, _ in files])
 
-@operation("Warp", "warp")
-def restore_warp(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            log_unsupported(app)
-        case OS.LINUX | OS.MAC:
-            dir >> UNIX_HOME / ".warp"
+def _pair_drift(source: File, target: File) -> tuple[Drift, File, int]:
+    """Drift of a live file against its backup, and the live size when they differ.
+
+    A pair that can't be read (e.g. permission denied, or removed while scanning) is reported as an error.
+    """
+    try:
+        return _read_pair_drift(source, target)
+    except OSError:
+        return Drift.ERROR, source, 0
+
+def _read_pair_drift(source: File, target: File) -> tuple[Drift, File, int]:
+    if not source.is_file():
+        return (Drift.MISSING, source, 0) if target.is_file() else (Drift.IN_SYNC, source, 0)
+    if MANIFEST.linked(source):
+        return Drift.IN_SYNC, source, 0
+    size = source.stat().st_size
+    if not target.is_file():
+        return Drift.CHANGED, source, size
+    entry = MANIFEST.entries.get(str(target), {})
+    if _fingerprint(source, entry.get("source"), target._transforms())[2] != _fingerprint(target, entry.get("target"))[2]:
+        return Drift.CHANGED, source, size
+    return Drift.IN_SYNC, source, 0
+
+def print_status(statuses: list[AppStatus]) -> None:
+    colors = {Drift.IN_SYNC: COLOR_GREEN, Drift.CHANGED: COLOR_YELLOW, Drift.MISSING: COLOR_RED, Drift.REPO_ONLY: COLOR_CYAN, Drift.ERROR: COLOR_RED, Drift.NOT_INSTALLED: COLOR_RESET, Drift.UNSUPPORTED: COLOR_RESET}
+    for status in statuses:
+        changed = f"  ({format_bytes(status.changed_bytes)})" if status.changed_bytes else ""
+        print(f"{colors[status.drift]}{status.drift:<13}{COLOR_RESET}  {status.app}{changed}")
+        for drift, path in status.files:
+            print(f"{'':15}{colors[drift]}{drift:<9}{COLOR_RESET}  {path}")
 
 # ------------------------------------------------------------------------------
-# Items - Windows Terminal
+# Watch
 # ------------------------------------------------------------------------------
-@operation("Windows Terminal", "windows-terminal")
-def backup_windows_terminal(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            WIN_LOCAL / "Packages/Microsoft.WindowsTerminal_8wekyb3d8bbwe/LocalState/settings.json" >> dir / "settings.json"
-        case OS.LINUX | OS.MAC:
-            log_unsupported(app)
+def watch_backups(apps: list[str], debounce: float) -> None:
+    """Back up each app whenever one of the files its backup reads changes, until interrupted."""
+    from dotfiles_watch import watch
 
-@operation("Windows Terminal", "windows-terminal")
-def restore_windows_terminal(app: str, dir: File):
-    match SYSTEM:
-        case OS.WIN:
-            dir >> WIN_LOCAL / "Packages/Microsoft.WindowsTerminal_8wekyb3d8bbwe/LocalState"
-        case OS.LINUX | OS.MAC:
-            log_unsupported(app)
+    _recover_dotfiles_roots()
+    groups = {
+        context.app: [transfer.source for transfer in context.plan]
+        for context in plan_operations([REGISTRY_BY_APP[app][Op.BACKUP] for app in apps])
+        if context.plan
+    }
+    log(f"{COLOR_CYAN}watch{COLOR_RESET} {sum(map(len, groups.values()))} paths of {', '.join(groups) or 'no apps'} (Ctrl+C to stop)")
+
+    def backup(changed: set[str]) -> None:
+        jetbrains_installs.cache_clear()
+        contexts = plan_operations([REGISTRY_BY_APP[app][Op.BACKUP] for app in apps if app in changed])
+        execute_plans(contexts)
+        MANIFEST.save()
+
+    try:
+        watch(groups, backup, log_error, debounce)
+    except KeyboardInterrupt:
+        pass
 
 # ------------------------------------------------------------------------------
-# Registry
+# Startup profile
 # ------------------------------------------------------------------------------
-REGISTRY_BY_CATEGORY: dict[str, dict[str, dict[Op, Callable[[], None]]]] = {
-    "AI": {
-        "Claude Code": {Op.BACKUP: backup_claude_code, Op.RESTORE: restore_claude_code},
-    },
-    "Terminal": {
-        "Ghostty":          {Op.BACKUP: backup_ghostty,          Op.RESTORE: restore_ghostty},
-        "PowerShell":       {Op.BACKUP: backup_powershell,       Op.RESTORE: restore_powershell},
-        "Starship":         {Op.BACKUP: backup_starship,         Op.RESTORE: restore_starship},
-        "Warp":             {Op.BACKUP: backup_warp,             Op.RESTORE: restore_warp},
-        "Windows Terminal": {Op.BACKUP: backup_windows_terminal, Op.RESTORE: restore_windows_terminal},
-    },
-    "Editor": {
-        "Helix":           {Op.BACKUP: backup_helix,     Op.RESTORE: restore_helix},
-        "JetBrains":       {Op.BACKUP: backup_jetbrains, Op.RESTORE: restore_jetbrains},
-        "RStudio":         {Op.BACKUP: backup_rstudio,   Op.RESTORE: restore_rstudio},
-        "VIM":             {Op.BACKUP: backup_vim,       Op.RESTORE: restore_vim},
-        "VSCode / Cursor": {Op.BACKUP: backup_vscode,    Op.RESTORE: restore_vscode},
-    },
-    "Notes": {
-        "Notable": {Op.BACKUP: backup_notable, Op.RESTORE: restore_notable},
-    },
-}
+def profile_imports(code: str = "import dotfiles, dotfiles_tui", env: dict[str, str] | None = None) -> list[tuple[str, int, int]]:
+    """Run `code` in a fresh interpreter with `-X importtime`; returns (module, self_us, cumulative_us) per imported module.
 
-REGISTRY_BY_APP: dict[str, dict[Op, Callable[[], None]]] = {
-    app: handlers
-    for category in REGISTRY_BY_CATEGORY.values()
-    for app, handlers in category.items()
-}
+    By default imports this script (including the paths it builds at import time) and the picker with its vendored UI stack.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, 'vendor'); {code}"],
+        cwd=Path(__file__).parent, env=env, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (.*)$", line)
+        if match:
+            imports.append((match[3].strip(), int(match[1]), int(match[2])))
+    return imports
+
+def print_profile_imports(top: int = 20) -> None:
+    """Print the slowest imports of the interactive startup path, by self time."""
+    imports = profile_imports()
+    print(f"{'self ms':>8}  {'cumul ms':>8}  module")
+    for module, self_us, cumulative_us in sorted(imports, key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{self_us / 1000:8.2f}  {cumulative_us / 1000:8.2f}  {module}")
+    print(f"{sum(item[1] for item in imports) / 1000:8.2f}  {'':8}  total ({len(imports)} modules)")
 
 # ------------------------------------------------------------------------------
 # Main
 # ------------------------------------------------------------------------------
 if __name__ == "__main__":
-    selections = show_tui(REGISTRY_BY_CATEGORY, Op.BACKUP, Op.RESTORE)
-    if not selections:
+    parser = argparse.ArgumentParser(description="Backup or restore dotfiles. Without arguments, opens the interactive picker.")
+    parser.add_argument("op", nargs="?", choices=[op.lower() for op in Op] + ["status", "watch", "history", "export", "import", "rollback", "resume"], help="operation to run without the picker; `sync` copies each file changed on one side only (live or backup) to the other and reports files changed on both, `status` compares live configs with their backup, `watch` keeps backing up apps as their files change, `history` lists snapshots, `export`/`import` write/restore the apps' backups as a tar.gz archive, `rollback` puts back the files replaced by the last restore or sync, `resume` finishes an interrupted restore or sync")
+    parser.add_argument("apps", nargs="*", help="apps or categories to run the operation on (e.g. helix vscode, or Editor)")
+    parser.add_argument("--all", "-a", action="store_true", help="run the operation on every app")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N", help="run up to N app handlers concurrently (default: 1)")
+    parser.add_argument("--dry-run", "-n", action="store_true", help="print the transfer plan and its size without touching disk")
+    parser.add_argument("--debounce", type=float, default=0.5, metavar="SECONDS", help="quiet time before `watch` backs up a changed app (default: 0.5)")
+    parser.add_argument("--strategy", "-s", type=Strategy, choices=list(Strategy), help="how restores put files in place (default: per app, usually copy)")
+    parser.add_argument("--quiet", "-q", action="store_true", help="don't print a line per transfer, only errors and the summary")
+    parser.add_argument("--report", type=Path, metavar="JSON", help="write per-operation metrics (time, files, bytes, errors, slowest paths) as JSON")
+    parser.add_argument("--snapshot", action="store_true", help="after a backup, record the backed up files as a snapshot in the local store")
+    parser.add_argument("--from", dest="snapshot_id", metavar="SNAPSHOT", help="restore from a snapshot id (or `latest`) instead of the dotfiles dir")
+    parser.add_argument("--archive", "-f", default="-", metavar="FILE", help="archive for `export`/`import` (default: - for stdout/stdin)")
+    parser.add_argument("--profile-startup", action="store_true", help="print the slowest imports of the interactive startup and exit")
+    args = parser.parse_args()
+    QUIET = args.quiet
+
+    if args.profile_startup:
+        print_profile_imports()
+        sys.exit(0)
+
+    if args.op == "history":
+        print_history()
         sys.exit(0)
 
-    for op_label, app in selections:
-        op = Op(op_label)
-        handler = REGISTRY_BY_APP[app][op]
-        handler()
+    if args.op == "rollback":
+        if not JOURNAL.run:
+            log("nothing to roll back")
+            sys.exit(0)
+        rolled_back = JOURNAL.rollback()
+        MANIFEST.save()
+        SYNC_STATE.save()
+        sys.exit(0 if rolled_back else 1)
+
+    resuming = args.op == "resume"
+    if resuming:
+        if not JOURNAL.interrupted():
+            log("nothing to resume")
+            sys.exit(0)
+        # run the interrupted restore again as it was started
+        args.strategy = Strategy(JOURNAL.run["strategy"]) if JOURNAL.run["strategy"] else None
+        args.snapshot_id = JOURNAL.run["snapshot"]
+        if "archive" in JOURNAL.run:
+            # an import is resumed by reading its archive again (from stdin when it was piped)
+            args.op, args.archive, args.all = "import", JOURNAL.run["archive"], False
+            args.apps = [app for _, app in JOURNAL.run["selections"]]
+
+    # anything else would write into the checkout, which later restores from the snapshot would read
+    if args.snapshot_id and args.op not in ("restore", "resume"):
+        parser.error("--from only applies to restores")
+
+    if args.snapshot_id:
+        # restore handlers read from DOTFILES, so point it at the snapshot; the checkout shares inodes with the
+        # store, so files are always copied out of it
+        try:
+            DOTFILES = File(STORE.checkout(args.snapshot_id))
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read snapshot {args.snapshot_id}: {e}")
+        args.strategy = Strategy.COPY
+
+    def plan(selections: list[tuple[str, str]]) -> list[Context]:
+        return plan_operations([REGISTRY_BY_APP[app][Op(op_label)] for op_label, app in selections], args.strategy)
+
+    def journal(run: dict) -> None:
+        """Journal a run writing live files, so it can be rolled back or resumed; continues the one being resumed."""
+        if resuming:
+            JOURNAL.resume()
+        elif JOURNAL.interrupted():
+            raise RuntimeError("the last restore was interrupted: run `resume` to finish it or `rollback` to undo it first")
+        else:
+            JOURNAL.begin(run)
+
+    def execute(selections: list[tuple[str, str]], contexts: list[Context]) -> None:
+        """Execute planned operations, journaling restores and syncs so they can be rolled back or resumed."""
+        restores = [[op_label, app] for op_label, app in selections if Op(op_label) in (Op.RESTORE, Op.SYNC)]
+        if resuming or restores:
+            journal({"selections": restores, "strategy": args.strategy, "snapshot": args.snapshot_id})
+        execute_plans(contexts, args.jobs)
+        # a cancelled restore stays resumable
+        JOURNAL.end(complete=not CANCEL.is_set())
+
+    contexts: list[Context] | None = None
+    if args.op == "resume":
+        selections = [(op_label, app) for op_label, app in JOURNAL.run["selections"]]
+    elif args.op:
+        if not args.apps and not args.all and args.op != "status":
+            parser.error("select apps to run on, or use --all")
+        try:
+            apps = list(REGISTRY_BY_APP) if args.all or not args.apps else select_apps(args.apps)
+        except KeyError as e:
+            parser.error(f"unknown app or category: {e}")
+        if args.op == "status":
+            statuses = scan_status(apps)
+            print_status(statuses)
+            sys.exit(0 if all(status.drift in (Drift.IN_SYNC, Drift.NOT_INSTALLED, Drift.UNSUPPORTED) for status in statuses) else 1)
+        if args.op == "watch":
+            watch_backups(apps, args.debounce)
+            sys.exit(0)
+        if args.op in ("export", "import"):
+            if args.archive == "-":
+                archive = sys.stdout.buffer if args.op == "export" else sys.stdin.buffer
+                # keep logs out of the archive stream
+                sys.stdout = sys.stderr
+            else:
+                archive = open(args.archive, "wb" if args.op == "export" else "rb")
+            with archive:
+                if args.op == "export":
+                    contexts = export_archive(apps, archive)
+                else:
+                    # an import is a restore, journaled the same way
+                    _recover_dotfiles_roots()
+                    try:
+                        journal({"selections": [[Op.RESTORE, app] for app in apps], "strategy": args.strategy, "snapshot": None, "archive": args.archive if args.archive == "-" else str(Path(args.archive).absolute())})
+                    except RuntimeError as e:
+                        parser.error(str(e))
+                    contexts = import_archive(apps, archive, args.strategy)
+                    JOURNAL.end()
+            MANIFEST.save()
+            log_summary(contexts)
+            if args.report:
+                write_report(args.report, contexts)
+            sys.exit(0 if not any(context.errors for context in contexts) else 1)
+        selections = [(Op(args.op.capitalize()), app) for app in apps]
+    else:
+        # the picker pulls in prompt_toolkit, so only import it when needed
+        from dotfiles_tui import Execution, TaskProgress, show_tui
+        def scan_markers(report: Callable[[str, str], None]) -> None:
+            scan_status(list(REGISTRY_BY_APP), on_status=lambda status: report(status.app, status.marker()))
+
+        # the selected operations run inside the picker, which shows their progress until closed
+        running: list[Context] = []
+        def run(selected: list[tuple[str, str]]) -> None:
+            _recover_dotfiles_roots()
+            planned = plan(selected)
+            for context in planned:
+                context.bytes_total = sum(transfer.size(context.rules_for(transfer.target)) for transfer in context.plan if not (transfer.optional and not transfer.source.exists()))
+            running.extend(planned)
+            try:
+                execute(selected, planned)
+            except RuntimeError as e:
+                log_error("Not started", e)
+                raise
+        def progress() -> list[TaskProgress]:
+            return [
+                TaskProgress(f"{context.name.partition('_')[0].capitalize()} {context.app}", context.state, context.examined, context.bytes_done, context.bytes_total, context.errors, context.seconds())
+                for context in running
+            ]
+        execution = None if args.dry_run else Execution(run, progress, CANCEL.set, format_bytes)
+
+        # log lines would draw over the full screen picker, so they are printed once it closes
+        HELD_LOGS = []
+        try:
+            selections = show_tui(REGISTRY_BY_CATEGORY, Op.BACKUP, Op.RESTORE, scan_markers, execution)
+        finally:
+            with PRINT_LOCK:
+                held, HELD_LOGS = HELD_LOGS, None
+                for line in held:
+                    _print_log(line)
+        if not selections:
+            sys.exit(0)
+        if execution is not None:
+            contexts = running
+
+    if contexts is None:
+        if not args.dry_run:
+            _recover_dotfiles_roots()
+        contexts = plan(selections)
+        if args.dry_run:
+            print_plans(contexts)
+            sys.exit(0)
+        try:
+            execute(selections, contexts)
+        except RuntimeError as e:
+            parser.error(str(e))
+
+    if args.snapshot:
+        snapshot_backups([context for context in contexts if context.name.startswith("backup")])
+    MANIFEST.save()
+    SYNC_STATE.save()
+    log_summary(contexts)
+    if args.report:
+        write_report(args.report, contexts)
+    sys.exit(1 if any(context.conflicts for context in contexts) else 0)
@@ -0,0 +1,248 @@
+import argparse
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tomllib
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+
+# ------------------------------------------------------------------------------
+# Manifest
+# ------------------------------------------------------------------------------
+MANIFEST = Path(__file__).parent / "packages.toml"
+"""Declarative list of the packages `setup-unix.sh` installs."""
+
+class Package(NamedTuple):
+    manager: str
+    name: str # brew formula or cask, apt package, asdf plugin, mas app id or editor extension id
+    version: str | None = None # asdf only
+    unless: str | None = None # skipped when this command is already on PATH (installed outside the manager)
+
+def load_manifest(path: Path, tags: set[str]) -> list[Package]:
+    """Packages of every group whose `when` tags all hold on this machine, in manifest order.
+
+    Entries are plain names, or tables with `name` and `unless`. asdf groups map plugins to versions, and `vscode`
+    extensions are installed into every editor of the VSCode family found.
+    """
+    with open(path, "rb") as f:
+        manifest = tomllib.load(f)
+    packages = []
+    for group in manifest["group"]:
+        if not set(group.get("when", [])) <= tags:
+            continue
+        for plugin, version in group.get("asdf", {}).items():
+            packages.append(Package("asdf", plugin, str(version)))
+        for section in ("apt", "brew", "mas", "vscode"):
+            for entry in group.get(section, []):
+                entry = entry if isinstance(entry, dict) else {"name": entry}
+                for manager in (EDITORS if section == "vscode" else (section,)):
+                    packages.append(Package(manager, str(entry["name"]), unless=entry.get("unless")))
+    return packages
+
+def machine_tags(personal: bool) -> set[str]:
+    """Tags a manifest group's `when` can require."""
+    system = {"Linux": "linux", "Darwin": "mac"}.get(platform.system(), platform.system().lower())
+    return {system, "personal" if personal else "work"}
+
+# ------------------------------------------------------------------------------
+# Managers
+# ------------------------------------------------------------------------------
+def _sudo() -> list[str]:
+    """Prefix of commands that need root: `$PROVISION_SUDO` when set (empty for none), else sudo unless already root."""
+    return os.environ.get("PROVISION_SUDO", "" if os.geteuid() == 0 else "sudo").split()
+
+def _query(*args: str) -> list[str]:
+    """Output lines of a listing command; none when it fails (`asdf list` and `mas list` fail when nothing is installed yet)."""
+    result = subprocess.run(args, capture_output=True, text=True)
+    return result.stdout.splitlines() if result.returncode == 0 else []
+
+def _run(*args: str, quiet: bool = False) -> bool:
+    """Run a command with its output on the terminal (or captured when `quiet`); False when it failed."""
+    result = subprocess.run(args, capture_output=quiet, text=True)
+    if result.returncode != 0:
+        log_error(f"Failed ({result.returncode}): {' '.join(args)}" + (f"\n{result.stderr.strip()}" if quiet else ""))
+    return result.returncode == 0
+
+def _parallel(jobs: int, calls: list[Callable[[], bool]]) -> bool:
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        return all(list(executor.map(lambda call: call(), calls)))
+
+def installed_apt() -> set[str]:
+    return {line.split()[1] for line in _query("dpkg-query", "-W", "-f=${db:Status-Status} ${Package}\n") if line.startswith("installed ")}
+
+def install_apt(missing: list[Package], installed: set[str], jobs: int) -> bool:
+    # apt-get already downloads from every mirror in parallel, and holds a lock for the whole install
+    return _run(*_sudo(), "apt-get", "install", "-y", *(package.name for package in missing))
+
+def installed_brew() -> set[str]:
+    return set(_query("brew", "list", "-1"))
+
+def install_brew(missing: list[Package], installed: set[str], jobs: int) -> bool:
+    names = [package.name for package in missing]
+    # downloads don't take the install lock, so fetch in parallel and install what's already in the cache
+    chunks = [names[i::jobs] for i in range(min(jobs, len(names)))]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        fetched = list(executor.map(lambda chunk: _run("brew", "fetch", "--retry", *chunk, quiet=True), chunks))
+    failed = [name for chunk, ok in zip(chunks, fetched) if not ok for name in chunk]
+    if failed:
+        log_error(f"Homebrew failed to fetch: {' '.join(failed)} (brew install downloads them again)")
+    return _run("brew", "install", *names)
+
+def installed_asdf() -> set[str]:
+    """Plugins (`name`) and their installed versions (`name version`), from a single `asdf list`."""
+    installed = set()
+    plugin = ""
+    for line in _query("asdf", "list"):
+        if not line.startswith(" "):
+            plugin = line.strip()
+            installed.add(plugin)
+        elif plugin and "No versions installed" not in line:
+            installed.add(f"{plugin} {line.strip().lstrip('*')}")
+    return installed
+
+def install_asdf(missing: list[Package], installed: set[str], jobs: int) -> bool:
+    plugins = [package.name for package in missing if package.name not in installed]
+    if not _parallel(jobs, [lambda plugin=plugin: _run("asdf", "plugin", "add", plugin) for plugin in plugins]):
+        return False
+    # each plugin downloads and builds on its own, so languages install in parallel
+    return _parallel(jobs, [lambda package=package: _run("asdf", "install", package.name, package.version) for package in missing])
+
+def select_asdf(packages: list[Package]) -> bool:
+    """Make the manifest's versions the user's defaults, whether they were just installed or already there."""
+    ok = True
+    for package in packages:
+        ok = _run("asdf", "set", "-u", package.name, package.version) and ok
+    return ok
+
+def installed_mas() -> set[str]:
+    return {line.split()[0] for line in _query("mas", "list") if line.strip()}
+
+def install_mas(missing: list[Package], installed: set[str], jobs: int) -> bool:
+    return _run("mas", "install", *(package.name for package in missing))
+
+def installed_extensions(editor: str) -> Callable[[], set[str]]:
+    return lambda: {line.strip().lower() for line in _query(editor, "--list-extensions")}
+
+def install_extensions(editor: str) -> Callable[[list[Package], set[str], int], bool]:
+    return lambda missing, installed, jobs: _run(editor, *(arg for package in missing for arg in ("--install-extension", package.name)))
+
+class Manager(NamedTuple):
+    label: str
+    command: str # required on PATH; the manager's packages are skipped without it
+    after: tuple[str, ...] # managers whose packages go first (e.g. brew installs mas, asdf and the editors)
+    installed: Callable[[], set[str]] # everything installed, in a single query
+    install: Callable[[list[Package], set[str], int], bool] # the missing packages, in as few commands as possible
+    key: Callable[[Package], str] # how a package appears in `installed`
+    select: Callable[[list[Package]], bool] | None = None # run for every wanted package, installed or not
+
+EDITORS = ("code", "cursor")
+
+MANAGERS: dict[str, Manager] = {
+    "apt":    Manager("APT",      "apt-get", (),               installed_apt,                    install_apt,                  lambda package: package.name),
+    "brew":   Manager("Homebrew", "brew",    ("apt",),         installed_brew,                   install_brew,                 lambda package: package.name.rpartition("/")[2]),
+    "asdf":   Manager("ASDF",     "asdf",    ("brew",),        installed_asdf,                   install_asdf,                 lambda package: f"{package.name} {package.version}", select_asdf),
+    "mas":    Manager("MAS",      "mas",     ("brew",),        installed_mas,                    install_mas,                  lambda package: package.name),
+    "code":   Manager("VSCode",   "code",    ("brew",),        installed_extensions("code"),     install_extensions("code"),   lambda package: package.name.lower()),
+    "cursor": Manager("Cursor",   "cursor",  ("brew",),        installed_extensions("cursor"),   install_extensions("cursor"), lambda package: package.name.lower()),
+}
+"""Package managers in install order; managers in the same wave of `after` dependencies install concurrently."""
+
+# ------------------------------------------------------------------------------
+# Provision
+# ------------------------------------------------------------------------------
+def provision(packages: list[Package], jobs: int = 4, dry_run: bool = False) -> bool:
+    """Install the missing packages; False when any install failed.
+
+    The installed state of every manager is queried once, concurrently, instead of once per package. Managers that
+    aren't on PATH yet are queried when their turn comes, since an earlier manager may have just installed them.
+    """
+    wanted: dict[str, list[Package]] = {}
+    for package in packages:
+        wanted.setdefault(package.manager, []).append(package)
+
+    with ThreadPoolExecutor(max_workers=len(MANAGERS)) as executor:
+        futures = {name: executor.submit(_snapshot, name) for name in wanted}
+        states = {name: future.result() for name, future in futures.items()}
+
+        ok = True
+        for wave in _waves(list(wanted)):
+            results = executor.map(lambda name: _install(name, wanted[name], states[name], jobs, dry_run), wave)
+            ok = all(list(results)) and ok
+    return ok
+
+def _snapshot(name: str) -> set[str] | None:
+    """Installed state of a manager, or None when it isn't on PATH."""
+    manager = MANAGERS[name]
+    if shutil.which(manager.command) is None:
+        return None
+    return manager.installed()
+
+def _install(name: str, packages: list[Package], installed: set[str] | None, jobs: int, dry_run: bool) -> bool:
+    manager = MANAGERS[name]
+    if installed is None:
+        installed = _snapshot(name)
+    if installed is None:
+        log_skip(f"{manager.label} not installed, skipping {len(packages)} packages")
+        return True
+
+    wanted = [package for package in packages if not (package.unless and shutil.which(package.unless))]
+    missing = [package for package in wanted if manager.key(package) not in installed]
+    skipped = len(packages) - len(missing)
+    if skipped:
+        log_skip(f"{manager.label} skipping {skipped} installed")
+    if missing:
+        log(f"{manager.label} installing: {' '.join(package.name if package.version is None else f'{package.name}@{package.version}' for package in missing)}")
+    if dry_run:
+        return True
+    ok = manager.install(missing, installed, jobs) if missing else True
+    if manager.select is not None and wanted:
+        ok = manager.select(wanted) and ok
+    return ok
+
+def _waves(names: list[str]) -> list[list[str]]:
+    """Managers grouped so each group only depends on earlier ones (dependencies not in `names` are ignored)."""
+    waves: list[list[str]] = []
+    done: set[str] = set()
+    pending = [name for name in MANAGERS if name in names]
+    while pending:
+        wave = [name for name in pending if all(after in done or after not in pending for after in MANAGERS[name].after)]
+        waves.append(wave)
+        done |= set(wave)
+        pending = [name for name in pending if name not in done]
+    return waves
+
+# ------------------------------------------------------------------------------
+# Log
+# ------------------------------------------------------------------------------
+def _log(color: str, message: str) -> None:
+    print("", file=sys.stderr)
+    print(f"{color}* [{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\033[0m", file=sys.stderr, flush=True)
+
+def log(message: str) -> None:
+    _log("\033[1;34m", message)
+
+def log_skip(message: str) -> None:
+    _log("\033[1;33m", message)
+
+def log_error(message: str) -> None:
+    _log("\033[1;31m", message)
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Install the packages of packages.toml that are missing on this machine.")
+    parser.add_argument("--manifest", type=Path, default=MANIFEST, help="package manifest (default: packages.toml next to this script)")
+    parser.add_argument("--personal", action="store_true", help="include the groups for personal machines instead of work ones")
+    parser.add_argument("--jobs", "-j", type=int, default=4, metavar="N", help="parallel downloads and installs per manager (default: 4)")
+    parser.add_argument("--dry-run", "-n", action="store_true", help="print what would be installed without installing it")
+    args = parser.parse_args()
+
+    packages = load_manifest(args.manifest, machine_tags(args.personal))
+    sys.exit(0 if provision(packages, args.jobs, args.dry_run) else 1)
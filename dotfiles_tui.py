@@ -1,5 +1,12 @@
+import threading
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+from pfzy.score import fzy_scorer
 from prompt_toolkit import Application
-from prompt_toolkit.formatted_text import FormattedText
+from prompt_toolkit.filters import Condition
+from prompt_toolkit.formatted_text import FormattedText, to_formatted_text
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.layout import HSplit, Layout, VSplit, Window, WindowAlign
 from prompt_toolkit.layout.containers import HorizontalAlign, VerticalAlign
@@ -8,6 +15,45 @@ from prompt_toolkit.styles import Style
 from prompt_toolkit.widgets import Frame
 
 
+class TaskProgress(NamedTuple):
+    """Live state of one running operation, as shown in the progress panel.
+
+    Also has the attributes prompt_toolkit's progress bar formatters read from a counter, so they can draw its bar.
+    """
+    label: str
+    state: str # "waiting", "running", "done" or "cancelled"
+    files: int
+    bytes_done: int
+    bytes_total: int
+    errors: int
+    seconds: float
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    @property
+    def stopped(self) -> bool:
+        return self.state == "cancelled"
+
+    @property
+    def total(self) -> int:
+        return self.bytes_total
+
+    @property
+    def percentage(self) -> float:
+        if self.done:
+            return 100.0
+        return min(100.0, 100.0 * self.bytes_done / self.bytes_total) if self.bytes_total else 0.0
+
+class Execution(NamedTuple):
+    """How the picker runs the selected items instead of just returning them."""
+    run: Callable[[list[tuple[str, str]]], None] # runs the (panel_label, item_name) selections, in a background thread
+    progress: Callable[[], list[TaskProgress]] # progress of every operation, polled while the panel is shown
+    cancel: Callable[[], None] # asks the operations to stop between files
+    format_bytes: Callable[[float], str] # how byte counts and rates are shown
+
+
 class TuiState:
     # panels
     panel_left: str # label for left panel
@@ -20,6 +66,23 @@ class TuiState:
 
     menu_items: list[tuple[str, bool]] # (label, is_item) for each menu row, in display order
     menu_items_indices: list[int] # indexes of menu_rows that are selectable (is_item = True)
+    menu_markers: dict[str, str] # item name → marker shown after its label, filled in by a background scan
+
+    # filter
+    filtering: bool # whether typed keys go to the filter box
+    filter_text: str
+    filter_matches: dict[int, list[int]] # row index → matched char indices, for items matching `filter_text`
+    visible_rows: list[int] # indexes of menu_items shown with the current filter (matching items and their categories)
+    visible_items: list[int] # indexes of visible rows that are selectable, in display order
+    visible_positions: dict[int, int] # row index → position in `visible_items`, so moving the cursor is O(1)
+    visible_row_positions: dict[int, int] # row index → position in `visible_rows`, so scrolling to the cursor is O(1)
+    panel_scrolls: dict[str, int] # first visible row shown in each panel
+
+    # execution
+    running: bool # whether the progress panel replaced the picker
+    finished: bool
+    cancelling: bool
+    run_error: str # why the execution failed, if it did
 
     def __init__(self, panel_left: str, panel_right: str, items: dict[str, dict[str, object]]):
         self.panel_left = panel_left
@@ -33,32 +96,53 @@ class TuiState:
                 self.menu_items.append((item_name, True))
 
         self.menu_items_indices = [i for i, (_, is_item) in enumerate(self.menu_items) if is_item]
+        self.menu_markers = {}
 
         # set panel state
         self.panel_active = panel_left
         self.panel_cursors = {panel_left: self.menu_items_indices[0], panel_right: self.menu_items_indices[0]}
         self.panel_selected = {panel_left: set(), panel_right: set()}
+        self.panel_scrolls = {panel_left: 0, panel_right: 0}
+
+        # set filter state
+        self.filtering = False
+        self.filter_text = ""
+        self.filter_matches = {}
+        self.set_filter("")
+
+        # set execution state
+        self.running = False
+        self.finished = False
+        self.cancelling = False
+        self.run_error = ""
 
     def switch_panel(self) -> None:
         self.panel_active = self.panel_right if self.is_active(self.panel_left) else self.panel_left
 
     def move_cursor(self, delta: int) -> None:
-        current = self.menu_items_indices.index(self.panel_cursors[self.panel_active])
-        new = max(0, min(len(self.menu_items_indices) - 1, current + delta))
-        self.panel_cursors[self.panel_active] = self.menu_items_indices[new]
+        if not self.visible_items:
+            return
+        current = self.visible_positions.get(self.panel_cursors[self.panel_active], 0)
+        new = max(0, min(len(self.visible_items) - 1, current + delta))
+        self.panel_cursors[self.panel_active] = self.visible_items[new]
 
     def cursor_to_first(self) -> None:
-        self.panel_cursors[self.panel_active] = self.menu_items_indices[0]
+        if self.visible_items:
+            self.panel_cursors[self.panel_active] = self.visible_items[0]
 
     def cursor_to_last(self) -> None:
-        self.panel_cursors[self.panel_active] = self.menu_items_indices[-1]
+        if self.visible_items:
+            self.panel_cursors[self.panel_active] = self.visible_items[-1]
 
     def toggle_item(self) -> None:
+        if self.panel_cursors[self.panel_active] not in self.visible_positions:
+            return
         name = self.menu_items[self.panel_cursors[self.panel_active]][0]
         self.panel_selected[self.panel_active] ^= {name}
 
     def select_all(self) -> None:
-        self.panel_selected[self.panel_active] = {label for label, is_item in self.menu_items if is_item}
+        """Select every item shown with the current filter."""
+        self.panel_selected[self.panel_active] |= {self.menu_items[row][0] for row in self.visible_items}
 
     def select_none(self) -> None:
         self.panel_selected[self.panel_active].clear()
@@ -66,10 +150,69 @@ class TuiState:
     def is_active(self, panel: str) -> bool:
         return panel == self.panel_active
 
-
-def show_tui(items: dict[str, dict[str, object]], panel_left: str, panel_right: str) -> list[tuple[str, str]]:
+    def selections(self) -> list[tuple[str, str]]:
+        """(panel_label, item_name) pairs of the selected items, in menu order."""
+        return [
+            (panel, name)
+            for panel in (self.panel_left, self.panel_right)
+            for name, is_item in self.menu_items
+            if is_item and name in self.panel_selected[panel]
+        ]
+
+    def set_filter(self, text: str) -> None:
+        """Show only items fuzzy matching `text` (with the categories they belong to).
+
+        When `text` extends the previous filter, only the items that matched it are scored again, since an item
+        that doesn't match a query can't match a longer one.
+        """
+        if self.filter_text and text.startswith(self.filter_text):
+            candidates = list(self.filter_matches)
+        else:
+            candidates = self.menu_items_indices
+        self.filter_text = text
+        self.filter_matches = {}
+        for row in candidates:
+            _, indices = fzy_scorer(text, self.menu_items[row][0]) if text else (0, [])
+            if indices is not None:
+                self.filter_matches[row] = indices
+
+        self.visible_rows = []
+        category = None
+        for row, (_, is_item) in enumerate(self.menu_items):
+            if not is_item:
+                category = row
+            elif row in self.filter_matches:
+                if category is not None and (not self.visible_rows or self.visible_rows[-1] < category):
+                    self.visible_rows.append(category)
+                self.visible_rows.append(row)
+        self.visible_items = [row for row in self.visible_rows if row in self.filter_matches]
+        self.visible_positions = {row: position for position, row in enumerate(self.visible_items)}
+        self.visible_row_positions = {row: position for position, row in enumerate(self.visible_rows)}
+
+        # keep cursors on visible items
+        for panel, cursor in self.panel_cursors.items():
+            if cursor not in self.visible_positions and self.visible_items:
+                self.panel_cursors[panel] = self.visible_items[0]
+
+    def scroll(self, panel: str, height: int) -> range:
+        """Positions in `visible_rows` shown in a panel `height` rows high, scrolled so its cursor stays in view."""
+        cursor = self.visible_row_positions.get(self.panel_cursors[panel], 0)
+        top = min(self.panel_scrolls[panel], cursor)
+        if cursor >= top + height:
+            top = cursor - height + 1
+        top = max(0, min(top, len(self.visible_rows) - height))
+        self.panel_scrolls[panel] = top
+        return range(top, min(top + height, len(self.visible_rows)))
+
+
+def show_tui(items: dict[str, dict[str, object]], panel_left: str, panel_right: str, scan: Callable[[Callable[[str, str], None]], None] | None = None, execution: Execution | None = None) -> list[tuple[str, str]]:
     """Two-panel picker over `items` (category → name → ...).
     Returns (panel_label, item_name) pairs in menu order.
+
+    If given, `scan` runs in a background thread while the picker is open and reports (item_name, marker) pairs;
+    each marker is shown next to its item as soon as it arrives.
+
+    If given, `execution` runs the selections when confirmed, and the picker shows their progress until closed.
     """
 
     state = TuiState(
@@ -82,6 +225,7 @@ def show_tui(items: dict[str, dict[str, object]], panel_left: str, panel_right:
     # TUI events
     # --------------------------------------------------------------------------
     kb = KeyBindings()
+    filtering = Condition(lambda: state.filtering)
 
     @kb.add("tab")
     @kb.add("s-tab")
@@ -106,35 +250,88 @@ def show_tui(items: dict[str, dict[str, object]], panel_left: str, panel_right:
     def _(event):
         state.cursor_to_last()
 
-    @kb.add("space")
+    @kb.add("space", filter=~filtering)
     def _(event):
         state.toggle_item()
 
-    @kb.add("a")
+    @kb.add("a", filter=~filtering)
     def _(event):
         state.select_all()
 
-    @kb.add("n")
+    @kb.add("n", filter=~filtering)
     def _(event):
         state.select_none()
 
-    @kb.add("enter")
+    @kb.add("enter", filter=~filtering)
     def _(event):
-        event.app.exit(result=True)
+        if execution is None or not state.selections():
+            event.app.exit(result=True)
+        else:
+            start_execution()
 
     @kb.add("c-c")
-    @kb.add("escape")
-    @kb.add("q")
+    @kb.add("escape", filter=~filtering)
+    @kb.add("q", filter=~filtering)
     def _(event):
         event.app.exit(result=False)
 
+    # filter: "/" starts typing a query, Enter keeps it and goes back to selecting, Esc clears it
+    @kb.add("/", filter=~filtering)
+    def _(event):
+        state.filtering = True
+
+    @kb.add("<any>", filter=filtering)
+    def _(event):
+        if event.data.isprintable():
+            state.set_filter(state.filter_text + event.data)
+
+    @kb.add("backspace", filter=filtering)
+    def _(event):
+        state.set_filter(state.filter_text[:-1])
+
+    @kb.add("enter", filter=filtering)
+    def _(event):
+        state.filtering = False
+
+    @kb.add("escape", filter=filtering)
+    def _(event):
+        state.filtering = False
+        state.set_filter("")
+
+    # progress: the picker keys are replaced while the selections run
+    kb_progress = KeyBindings()
+
+    @kb_progress.add("c")
+    @kb_progress.add("c-c")
+    @kb_progress.add("escape")
+    @kb_progress.add("q")
+    def _(event):
+        if state.finished:
+            event.app.exit(result=True)
+        elif not state.cancelling:
+            state.cancelling = True
+            execution.cancel()
+
+    @kb_progress.add("enter")
+    def _(event):
+        if state.finished:
+            event.app.exit(result=True)
+
     # --------------------------------------------------------------------------
     # mount TUI
     # --------------------------------------------------------------------------
+    def tui_panel_height() -> int:
+        # terminal rows minus the filter box, help line and panel borders
+        return max(1, min(len(state.menu_items), tui.output.get_size().rows - 4))
+
     def tui_panel(panel: str) -> FormattedText:
         fragments: list[tuple[str, str]] = []
 
-        for row_index, (item_label, item_is_item) in enumerate(state.menu_items):
+        # render only the rows in view
+        for position in state.scroll(panel, tui_panel_height()):
+            row_index = state.visible_rows[position]
+            item_label, item_is_item = state.menu_items[row_index]
+
             # render category
             if not item_is_item:
                 fragments.append(("class:category", f" {item_label}\n"))
@@ -152,48 +349,140 @@ def show_tui(items: dict[str, dict[str, object]], panel_left: str, panel_right:
             # determine if selected or not
             item_marker = "[●]" if item_label in state.panel_selected[panel] else "[ ]"
 
-            # render item
-            fragments.append((row_style, f" {item_cursor} {item_marker} {item_label}\n"))
+            # render item, highlighting filter matches, with its scan marker if there is one
+            fragments.append((row_style, f" {item_cursor} {item_marker} "))
+            matched = set(state.filter_matches.get(row_index, ()))
+            fragments.extend((f"{row_style} class:match" if i in matched else row_style, char) for i, char in enumerate(item_label))
+            if item_label in state.menu_markers:
+                fragments.append(("class:marker", f"  {state.menu_markers[item_label]}"))
+            fragments.append((row_style, "\n"))
 
         return FormattedText(fragments)
 
+    def tui_filter() -> FormattedText:
+        if not state.filtering and not state.filter_text:
+            return FormattedText([("class:help", "[/] filter")])
+        cursor = "▏" if state.filtering else ""
+        return FormattedText([("class:filter", f"/ {state.filter_text}{cursor}"), ("class:help", f"  {len(state.visible_items)} of {len(state.menu_items_indices)}")])
+
     def tui_panel_title(panel: str) -> str:
         return f"{'●' if state.is_active(panel) else ' '} {panel}"
 
+    def tui_progress() -> FormattedText:
+        fragments: list[tuple[str, str]] = []
+        tasks = execution.progress()
+        format_bytes = execution.format_bytes
+        for task in tasks:
+            style = {"running": "class:running", "cancelled": "class:cancelled", "waiting": "class:help"}.get(task.state, "")
+            rate = f"{format_bytes(task.bytes_done / task.seconds)}/s" if task.seconds > 0 and task.state != "waiting" else ""
+            fragments.append((style, f" {task.label[:22]:<22} {task.state:<9} "))
+            fragments.extend(to_formatted_text(progress_bar.format(None, task, 18)))
+            fragments.append(("", f" {task.percentage:3.0f}%  {task.files:6} files  {format_bytes(task.bytes_done):>10} / {format_bytes(task.bytes_total):<10} {rate:>11}  "))
+            fragments.append(("class:error" if task.errors else "class:help", f"{task.errors} errors\n"))
+
+        # totals
+        done = sum(task.bytes_done for task in tasks)
+        seconds = max((task.seconds for task in tasks), default=0.0)
+        errors = sum(task.errors for task in tasks)
+        finished = sum(task.state in ("done", "cancelled") for task in tasks)
+        fragments.append(("", "\n"))
+        fragments.append(("class:category", f" {finished} of {len(tasks)} operations  {format_bytes(done)}" + (f" at {format_bytes(done / seconds)}/s" if seconds > 0 else "") + "  "))
+        fragments.append(("class:error" if errors else "class:help", f"{errors} errors\n"))
+        if state.run_error:
+            fragments.append(("class:error", f" {state.run_error}\n"))
+        return FormattedText(fragments)
+
+    def tui_progress_status() -> FormattedText:
+        if state.finished:
+            return FormattedText([("class:help", "[Enter/q] close")])
+        if state.cancelling:
+            return FormattedText([("class:cancelled", "cancelling after the current files...")])
+        return FormattedText([("class:help", "[c/q/Esc] cancel")])
+
     tui_theme = Style.from_dict({
         "category":         "bold ansicyan",
         "focused":          "reverse bold",
         "cursor-inactive":  "ansiblue",
         "help":             "ansibrightblack",
+        "marker":           "ansibrightblack",
+        "match":            "bold ansiyellow",
+        "filter":           "bold",
         "frame.label":      "bold",
+        "running":          "bold",
+        "cancelled":        "ansiyellow",
+        "error":            "bold ansired",
+        "bar-a":            "ansigreen",
+        "bar-b":            "ansigreen bold",
+        "bar-c":            "ansibrightblack",
     })
 
     tui_layout = Layout(
         HSplit([
+            # filter box
+            Window(FormattedTextControl(tui_filter), height=1, align=WindowAlign.CENTER),
             # side-by-side panels
             VSplit([
-                Frame(Window(FormattedTextControl(lambda: tui_panel(panel_left)), height=len(state.menu_items)), width=40, title=lambda: tui_panel_title(panel_left)),
-                Frame(Window(FormattedTextControl(lambda: tui_panel(panel_right)), height=len(state.menu_items)), width=40, title=lambda: tui_panel_title(panel_right)),
+                Frame(Window(FormattedTextControl(lambda: tui_panel(panel_left)), height=tui_panel_height), width=40, title=lambda: tui_panel_title(panel_left)),
+                Frame(Window(FormattedTextControl(lambda: tui_panel(panel_right)), height=tui_panel_height), width=40, title=lambda: tui_panel_title(panel_right)),
             ], padding=1, align=HorizontalAlign.CENTER),
             # help text
             Window(
-                FormattedTextControl("[Tab/←→] switch panel  [↑↓] move  [Space] toggle  [a] all  [n] none  [Enter] confirm  [q/Esc] cancel"),
+                FormattedTextControl("[Tab/←→] switch panel  [↑↓] move  [Space] toggle  [a] all  [n] none  [/] filter  [Enter] confirm  [q/Esc] cancel"),
                 height=1, style="class:help", align=WindowAlign.CENTER
             )
         ], align=VerticalAlign.CENTER)
     )
 
+    tui_progress_layout = Layout(
+        HSplit([
+            Frame(Window(FormattedTextControl(tui_progress)), width=120, title="Progress"),
+            Window(FormattedTextControl(tui_progress_status), height=1, align=WindowAlign.CENTER),
+        ], align=VerticalAlign.CENTER)
+    )
+
     tui = Application(layout=tui_layout, key_bindings=kb, style=tui_theme, full_screen=True, mouse_support=False)
 
+    # --------------------------------------------------------------------------
+    # run selections
+    # --------------------------------------------------------------------------
+    progress_bar = None
+
+    def start_execution() -> None:
+        nonlocal progress_bar
+        # only the bar formatter is used: the progress bar shortcut runs its own application, so it can't be nested
+        from prompt_toolkit.shortcuts.progress_bar.formatters import Bar
+        progress_bar = Bar(start="▕", end="▏", sym_a="█", sym_b="▌", sym_c=" ")
+        state.running = True
+        tui.layout = tui_progress_layout
+        tui.key_bindings = kb_progress
+        threading.Thread(target=run_execution, args=(state.selections(),), daemon=True).start()
+        threading.Thread(target=refresh_progress, daemon=True).start()
+
+    def run_execution(selections: list[tuple[str, str]]) -> None:
+        try:
+            execution.run(selections)
+        except Exception as e:
+            state.run_error = str(e)
+        finally:
+            state.finished = True
+            tui.invalidate()
+
+    def refresh_progress() -> None:
+        while not state.finished:
+            tui.invalidate()
+            time.sleep(0.1)
+
     # --------------------------------------------------------------------------
     # run TUI
     # --------------------------------------------------------------------------
+    def report(name: str, marker: str) -> None:
+        state.menu_markers[name] = marker
+        tui.invalidate()
+
+    if scan is not None:
+        threading.Thread(target=scan, args=(report,), daemon=True).start()
+
     if not tui.run():
         return []
 
-    return [
-        (panel, name)
-        for panel in (panel_left, panel_right)
-        for name, is_item in state.menu_items
-        if is_item and name in state.panel_selected[panel]
-    ]
+    return state.selections()
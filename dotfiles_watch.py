@@ -0,0 +1,211 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+
+# ------------------------------------------------------------------------------
+# Inotify (Linux)
+# ------------------------------------------------------------------------------
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ISDIR       = 0x40000000
+IN_NONBLOCK    = os.O_NONBLOCK
+IN_CLOEXEC     = 0o2000000
+
+IN_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ATTRIB
+"""Events that mean a watched file was written, replaced (editors saving through a rename) or removed."""
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyEvents:
+    """Changed groups from inotify watches on the parent dirs of watched files (so renames on save are seen)
+    and on every dir of watched trees. Paths under a missing dir are watched from their nearest existing ancestor
+    until they are created. Blocks in `select`, so it costs nothing while idle."""
+
+    fd: int
+    groups: dict[str, list[Path]]
+    on_error: Callable[[str, Exception], None]
+    dirs: dict[int, Path] # watch → watched dir
+    files: dict[int, dict[str, set[str]]] # watch → file name → groups
+    trees: dict[int, set[str]] # watch → groups, for dirs inside watched trees
+    missing: dict[int, set[tuple[Path, str]]] # watch → (path, group) not created yet, for their nearest existing ancestor
+
+    def __init__(self, groups: dict[str, list[Path]], on_error: Callable[[str, Exception], None]):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.groups = groups
+        self.on_error = on_error
+        self.dirs = {}
+        self.files = {}
+        self.trees = {}
+        self.missing = {}
+        self._watch_all()
+
+    def _watch_all(self) -> None:
+        for group, paths in self.groups.items():
+            for path in paths:
+                self._watch(path, group)
+
+    def _watch(self, path: Path, group: str) -> None:
+        """Watch `path` for `group`: every dir of a tree, the parent dir of a file, or the nearest existing ancestor
+        of a path whose parent is missing. A failed watch is reported and skipped, so the other paths stay watched."""
+        try:
+            if path.is_dir():
+                for dirpath, _, _ in os.walk(path):
+                    self._add_watch(Path(dirpath), tree=group)
+            elif path.parent.is_dir():
+                wd = self._add_watch(path.parent)
+                self.files.setdefault(wd, {}).setdefault(path.name, set()).add(group)
+            else:
+                ancestor = next(parent for parent in path.parents if parent.is_dir())
+                wd = self._add_watch(ancestor)
+                self.missing.setdefault(wd, set()).add((path, group))
+        except OSError as e:
+            self.on_error(f"Failed to watch {path}", e)
+
+    def _add_watch(self, dir: Path, tree: str | None = None) -> int:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir), IN_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {dir}")
+        self.dirs[wd] = dir
+        if tree is not None:
+            self.trees.setdefault(wd, set()).add(tree)
+        return wd
+
+    def wait(self, timeout: float | None) -> set[str]:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        changed: set[str] = set()
+        rewatch = False
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0"))
+            offset += EVENT_HEADER.size + length
+            # events were dropped: anything may have changed, and new dirs may have been missed
+            if mask & IN_Q_OVERFLOW:
+                changed |= set(self.groups)
+                rewatch = True
+                continue
+            # the watched dir was removed: watch its paths again from what is left
+            if mask & IN_IGNORED:
+                for watches in (self.dirs, self.files, self.trees, self.missing):
+                    watches.pop(wd, None)
+                rewatch = True
+                continue
+            changed |= self.files.get(wd, {}).get(name, set())
+            changed |= self.trees.get(wd, set())
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                created = self.dirs[wd] / name
+                # dirs created inside a watched tree are watched too
+                for group in self.trees.get(wd, set()):
+                    self._watch(created, group)
+                # a dir on the way to a missing path: watch from there, and back up if the path is already in
+                for path, group in [(path, group) for path, group in self.missing.get(wd, set()) if path.is_relative_to(created)]:
+                    self.missing[wd].discard((path, group))
+                    self._watch(path, group)
+                    if path.exists():
+                        changed.add(group)
+                # a watched file replaced by a dir is watched as a tree
+                for group in self.files.get(wd, {}).get(name, set()):
+                    self._watch(created, group)
+        if rewatch:
+            self._watch_all()
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+# ------------------------------------------------------------------------------
+# Polling (everywhere else)
+# ------------------------------------------------------------------------------
+class PollingEvents:
+    """Changed groups found by comparing size and mtime of every watched file every `interval` seconds."""
+
+    groups: dict[str, list[Path]]
+    interval: float
+    snapshots: dict[str, dict[Path, tuple[int, int]]]
+
+    def __init__(self, groups: dict[str, list[Path]], interval: float):
+        self.groups = groups
+        self.interval = interval
+        self.snapshots = {group: self._snapshot(paths) for group, paths in groups.items()}
+
+    @staticmethod
+    def _snapshot(paths: list[Path]) -> dict[Path, tuple[int, int]]:
+        snapshot = {}
+        for path in paths:
+            files = [Path(dirpath, filename) for dirpath, _, filenames in os.walk(path) for filename in filenames] if path.is_dir() else [path]
+            for file in files:
+                try:
+                    stat = file.stat()
+                    snapshot[file] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    pass
+        return snapshot
+
+    def wait(self, timeout: float | None) -> set[str]:
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        changed = set()
+        for group, paths in self.groups.items():
+            snapshot = self._snapshot(paths)
+            if snapshot != self.snapshots[group]:
+                self.snapshots[group] = snapshot
+                changed.add(group)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+# ------------------------------------------------------------------------------
+# Watch
+# ------------------------------------------------------------------------------
+def watch(groups: dict[str, list[Path]], on_change: Callable[[set[str]], None], on_error: Callable[[str, Exception], None], debounce: float = 0.5, poll_interval: float = 2.0) -> None:
+    """Call `on_change` with the groups whose files changed, until interrupted.
+
+    Events are debounced per group: a group fires once it has been quiet for `debounce` seconds, so an editor's
+    burst of writes on save triggers a single call. Uses inotify on Linux and falls back to polling elsewhere.
+    Failed watches and errors raised by `on_change` are passed to `on_error` and watching goes on.
+    """
+    try:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is Linux only")
+        events = InotifyEvents(groups, on_error)
+    except OSError:
+        events = PollingEvents(groups, poll_interval)
+
+    pending: dict[str, float] = {} # group → deadline
+    try:
+        while True:
+            timeout = max(0.0, min(pending.values()) - time.monotonic()) if pending else None
+            for group in events.wait(timeout):
+                pending[group] = time.monotonic() + debounce
+            now = time.monotonic()
+            ready = {group for group, deadline in pending.items() if deadline <= now}
+            if ready:
+                for group in ready:
+                    del pending[group]
+                try:
+                    on_change(ready)
+                except Exception as e:
+                    on_error(f"Failed to handle changes of {', '.join(sorted(ready))}", e)
+    finally:
+        events.close()
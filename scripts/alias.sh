@@ -1,6 +1,6 @@
-# checks
-function is_linux() { [[ "$(uname -s)" == "Linux"  ]]; }
-function is_mac()   { [[ "$(uname -s)" == "Darwin" ]]; }
+# checks (OSTYPE is set by bash and zsh, so checks don't fork `uname` on every call)
+function is_linux() { [[ "$OSTYPE" == linux*  ]]; }
+function is_mac()   { [[ "$OSTYPE" == darwin* ]]; }
 function is_bash()  { [[ -n "$BASH_VERSION" ]]; }
 function is_zsh()   { [[ -n "$ZSH_VERSION"  ]]; }
 
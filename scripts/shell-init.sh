@@ -0,0 +1,124 @@
+#!/bin/bash
+# Generate the cached init sourced by .bashrc/.zshrc, so new shells don't fork `starship init`, `zoxide init`
+# or source every bash completion file.
+#
+# The cache holds the full init scripts printed by the tools and a loader that sources a completion file the first
+# time its command is completed. It starts with a guard that makes sourcing it fail when a tool, the completions dir
+# or this script is newer than the cache, or a tool's binary moved (upgraded), so the rc file regenerates it.
+#
+# usage: shell-init.sh [bash|zsh]...   (default: both)
+
+CACHE_DIR=${SHELL_INIT_CACHE:-${XDG_CACHE_HOME:-$HOME/.cache}/shell-init}
+SCRIPT=$(realpath "$0")
+
+# ------------------------------------------------------------------------------
+# Stages
+# ------------------------------------------------------------------------------
+
+# Print the init script of a tool, registering its binary in the guard.
+function stage_tool() {
+    local tool=$1
+    shift
+    local path
+    path=$(command -v "$tool") || return 0
+    local real
+    real=$(realpath "$path")
+    guard_newer+=("$path")
+    guard_exists+=("$real")
+    versions+=("$tool: $("$tool" --version 2>/dev/null | head -n 1) ($real)")
+    echo "# stage: $tool"
+    "$tool" "$@"
+    echo ""
+}
+
+# Print a loader of the bash completions of Homebrew, sourcing each file when its command is first completed.
+function stage_completions() {
+    local dir
+    dir="$(brew --prefix 2>/dev/null)/etc/bash_completion.d"
+    [ -d "$dir" ] || return 0
+    guard_newer+=("$dir")
+
+    echo "# stage: completions"
+    local eager=()
+    echo "function _shell_init_complete() {"
+    echo "    case \$1 in"
+    local file
+    for file in "$dir"/*; do
+        # commands a file registers, found by sourcing it once here instead of in every shell
+        local commands
+        commands=$(bash --norc --noprofile -c 'source "$1" >/dev/null 2>&1; complete -p' _ "$file" 2>/dev/null | awk '$NF !~ /^-/ { print $NF }' | sort -u | paste -sd '|' -)
+        if [ -n "$commands" ]; then
+            printf '        %s) source %q ;;\n' "$commands" "$file"
+        else
+            eager+=("$file")
+        fi
+    done
+    echo "        *) return 1 ;;"
+    echo "    esac"
+    # 124 makes bash retry the completion with the specs the file just registered
+    echo "    return 124"
+    echo "}"
+    echo "if (( BASH_VERSINFO[0] > 4 || BASH_VERSINFO[0] == 4 && BASH_VERSINFO[1] >= 1 )); then"
+    echo "    complete -D -o bashdefault -o default -F _shell_init_complete"
+    for file in "${eager[@]}"; do
+        printf '    source %q\n' "$file"
+    done
+    echo "else"
+    printf '    for COMPLETION in %s; do source "$COMPLETION"; done\n' "$(printf '%q ' "$dir"/*)"
+    echo "fi"
+    echo ""
+}
+
+# ------------------------------------------------------------------------------
+# Generate
+# ------------------------------------------------------------------------------
+
+# Write the cached init of a shell, replacing the previous one atomically.
+function generate() {
+    local shell=$1
+    local target=$CACHE_DIR/init.$shell
+    guard_newer=("$SCRIPT")
+    guard_exists=()
+    versions=()
+
+    mkdir -p "$CACHE_DIR"
+    # a group redirection runs in this shell, so the stages can fill the guard arrays
+    {
+        stage_tool starship init "$shell" --print-full-init
+        stage_tool zoxide init "$shell"
+        if [ "$shell" == "bash" ]; then
+            stage_completions
+        fi
+    } > "$target.body"
+
+    local conditions=()
+    local path
+    for path in "${guard_newer[@]}"; do
+        conditions+=("$(printf %q "$path") -nt $(printf %q "$target")")
+    done
+    for path in "${guard_exists[@]}"; do
+        conditions+=("! -e $(printf %q "$path")")
+    done
+
+    {
+        echo "# generated by $SCRIPT $shell on $(date +"%Y-%m-%d %H:%M:%S"); rerun it after installing a tool"
+        for version in "${versions[@]}"; do
+            echo "# $version"
+        done
+        local joined
+        joined=$(printf ' || %s' "${conditions[@]}")
+        echo "[[ ${joined# || } ]] && return 1"
+        echo ""
+        cat "$target.body"
+        echo "return 0"
+    } > "$target.tmp" && mv "$target.tmp" "$target"
+    rm -f "$target.body"
+}
+
+shells=("$@")
+if [ ${#shells[@]} -eq 0 ]; then
+    shells=(bash zsh)
+fi
+for shell in "${shells[@]}"; do
+    generate "$shell"
+done
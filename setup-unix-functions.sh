@@ -98,64 +98,6 @@ function install_brew() {
     fi
 }
 
-# Install something with ASDF.
-function install_asdf() {
-    lang=$1
-    version=$2
-
-    # install plugin and lang
-    log "ASDF installing: $lang $version"
-    if ! asdf plugin list 2>/dev/null | grep -qw "$lang"; then
-        asdf plugin add $lang
-    else
-        log_skip "ASDF plugin skipping: $lang"
-    fi
-    if ! asdf list $lang 2>/dev/null | grep -qw "$version"; then
-        asdf install $lang $version
-    else
-        log_skip "ASDF version skipping: $lang $version"
-    fi
-    asdf set -u $lang $version
-    reload
-}
-
-# Install something from the App Store with mas.
-function install_mas() {
-    if ! mas list | awk '{print $1}' | grep -qw "$1"; then
-        log "MAS installing: $1"
-        mas install $1
-    else
-        log_skip "MAS skipping: $1"
-    fi
-}
-
-# Install something for VSCode or Cursor
-function install_vscode() {
-    if installed "code"; then
-        if [ -z "$CACHE_VSCODE_EXTENSIONS" ]; then
-            CACHE_VSCODE_EXTENSIONS=$(code --list-extensions)
-        fi
-        if ! echo "$CACHE_VSCODE_EXTENSIONS" | grep -qi "^$1\$"; then
-            log "Installing VSCode extension: $1"
-            code --install-extension $1
-        else
-            log_skip "VSCode skipping: $1"
-        fi
-    fi
-
-    if installed "cursor"; then
-        if [ -z "$CACHE_CURSOR_EXTENSIONS" ]; then
-            CACHE_CURSOR_EXTENSIONS=$(cursor --list-extensions)
-        fi
-        if ! echo "$CACHE_CURSOR_EXTENSIONS" | grep -qi "^$1\$"; then
-            log "Installing Cursor extension: $1"
-            cursor --install-extension $1
-        else
-            log_skip "Cursor skipping: $1"
-        fi
-    fi
-}
-
 # ------------------------------------------------------------------------------
 # Download / Extract
 # ------------------------------------------------------------------------------
@@ -17,6 +17,14 @@ mkdir -p $DIR_DOWNLOADS
 mkdir -p $DIR_SCRIPTS
 mkdir -p $DIR_TOOLS
 
+# ------------------------------------------------------------------------------
+# Install scripts
+# ------------------------------------------------------------------------------
+# before the rc files below are written and reloaded, since they source and run them
+log "Installing scripts"
+cp scripts/alias.sh $DIR_SCRIPTS
+cp scripts/shell-init.sh $DIR_SCRIPTS
+
 # ------------------------------------------------------------------------------
 # Install .shell_common
 # ------------------------------------------------------------------------------
@@ -65,10 +73,16 @@ export PATH=\$PATH:$DIR_TOOLS/FlameGraph
 # system
 ulimit -n 65365
 
-# ssh
-pkill ssh-agent
-eval "\$(ssh-agent -s)"
-ssh-add $HOME/.ssh/dinhani
+# ssh (one agent shared by every shell, found through its env file instead of starting a new one)
+SSH_AGENT_ENV=$HOME/.ssh/agent.env
+if [ -f "\$SSH_AGENT_ENV" ]; then
+    source "\$SSH_AGENT_ENV" >/dev/null
+fi
+if [ -z "\$SSH_AGENT_PID" ] || ! kill -0 "\$SSH_AGENT_PID" 2>/dev/null; then
+    ssh-agent -s > "\$SSH_AGENT_ENV"
+    source "\$SSH_AGENT_ENV" >/dev/null
+    ssh-add $HOME/.ssh/dinhani
+fi
 
 # asdf
 export PATH=\$HOME/.asdf/shims:\$PATH
@@ -93,17 +107,9 @@ if [ -e ~/.shell_private ]; then
     source ~/.shell_private
 fi
 
-# completions
-for COMPLETION in "$(brew_dir)/etc/bash_completion.d/"*
-do
-    source "\${COMPLETION}"
-done
-
-# starship
-eval "\$(starship init bash)"
-
-# zoxide
-eval "\$(zoxide init bash)"
+# starship, zoxide and completions, cached by shell-init.sh (regenerated when a tool changes)
+SHELL_INIT=\${XDG_CACHE_HOME:-\$HOME/.cache}/shell-init/init.bash
+source "\$SHELL_INIT" 2>/dev/null || { $DIR_SCRIPTS/shell-init.sh bash && source "\$SHELL_INIT"; }
 EOF
 
 reload
@@ -128,11 +134,9 @@ source $HOME/.oh-my-zsh/oh-my-zsh.sh
 export LS_COLORS="$LS_COLORS:ow=1;34:tw=1;34:"
 zstyle ':completion:*' list-colors \${(s.:.)LS_COLORS}
 
-# starship
-eval "\$(starship init zsh)"
-
-# zoxide
-eval "\$(zoxide init zsh)"
+# starship and zoxide, cached by shell-init.sh (regenerated when a tool changes)
+SHELL_INIT=\${XDG_CACHE_HOME:-\$HOME/.cache}/shell-init/init.zsh
+source "\$SHELL_INIT" 2>/dev/null || { $DIR_SCRIPTS/shell-init.sh zsh && source "\$SHELL_INIT"; }
 EOF
 
 if [[ ! -d "$HOME/.oh-my-zsh" ]]; then
@@ -146,10 +150,6 @@ reload
 # Install configurations
 # ------------------------------------------------------------------------------
 
-# config: aliases
-log "Configuring aliases"
-cp scripts/alias.sh $DIR_SCRIPTS
-
 # config: editor
 if is_linux; then
     log "Configuring editor"
@@ -207,216 +207,32 @@ if not_installed "brew"; then
 fi
 
 # ------------------------------------------------------------------------------
-# Install MAS (Mac App Store CLI)
+# Install packages (Homebrew, APT, MAS, ASDF, VSCode extensions from packages.toml)
 # ------------------------------------------------------------------------------
-if is_mac; then
-    install_brew mas
-fi
+log "Installing packages"
 
-# ------------------------------------------------------------------------------
-# Install Desktop tools
-# ------------------------------------------------------------------------------
-if is_mac; then
-    # hardware
-    install_brew elgato-stream-deck
-    install_brew logitech-g-hub
-    install_brew linearmouse
-
-    # docs
-    install_brew notable
-    install_brew obsidian
-
-    # media
-    install_brew spotify
-
-    # terminal
-    install_brew ghostty
-    install_brew warp
-
-    # dev editors (individual)
-    if not_installed "code"; then
-        install_brew visual-studio-code
-    fi
-    if not_installed "cursor"; then
-        install_brew "cursor"
-    fi
-    install_brew rstudio
-
-    # dev editors (jetbrains)
-    install_brew jetbrains-toolbox
-    install_brew clion
-    install_brew datagrip
-    install_brew dataspell
-    install_brew goland
-    install_brew intellij-idea
-    install_brew phpstorm
-    install_brew pycharm
-    install_brew rider
-    install_brew rubymine
-    install_brew rustrover
-    install_brew webstorm
-
-    # dev tools
-    install_brew bruno
-    install_brew devtoys
-
-    # utils
-    install_brew google-chrome
-
-    # app store
-    install_mas 937984704  # Amphetamine
-    install_mas 6448461551 # Command X
-    install_mas 411643860  # DaisyDisk
-    install_mas 1111570163 # GrandPerspective
-    install_mas 441258766  # Magnet
-    install_mas 1606145041 # Sleeve
-
-    # personal only
-    if is_personal; then
-        install_mas 1136220934 # Infuse
-        install_mas 510620098  # MediaInfo
-    fi
-
-    # work only
-    if is_work; then
-        install_brew slack
-    fi
+# the provisioner needs Python 3.11+ (tomllib), newer than the python3 macOS ships
+PYTHON=python3
+if ! $PYTHON -c "import tomllib" >/dev/null 2>&1; then
+    install_brew python
+    PYTHON="$(brew_dir)/bin/python3"
 fi
-
-# ------------------------------------------------------------------------------
-# Install build tools
-# ------------------------------------------------------------------------------
-log "Installing build tools"
-
-install_brew autoconf
-install_brew bison
-install_brew cmake
-install_brew flex
-install_brew gcc
-install_brew gcc@11
-install_brew gcc@12
-install_brew gcc@13
-install_brew gettext
-install_brew just
-install_brew llvm
-install_brew make
-install_brew pkgconf
-install_brew protobuf
-install_brew re2c
-
-log "Installing build tools libraries"
-install_brew bzip2
-install_brew freetype
-install_brew gmp
-install_brew icu4c@78
-install_brew jpeg
-install_brew krb5
-install_brew libffi
-install_brew libiconv
-install_brew libpng
-install_brew libsodium
-install_brew libxml2
-install_brew libyaml
-install_brew libzip
-install_brew oniguruma
-install_brew openssl@3
-install_brew readline
-install_brew sqlite
-install_brew webp
-install_brew xz
-install_brew zlib
-
-# ------------------------------------------------------------------------------
-# Install CLI tools
-# ------------------------------------------------------------------------------
-log "Installing CLI tools"
-
-# shells
-install_brew bash
-install_brew nushell
-install_brew zsh
-install_brew starship
-
-# managers
-install_brew asdf
-install_brew mise
-
-# other
-install_brew bat
-install_brew claude-code
-install_brew dasel
-install_brew erdtree
-install_brew eza
-install_brew fd
-install_brew fzf
-install_brew gitql
-install_brew gnupg
-install_brew graphviz
-install_brew helix
-install_brew htmlq
-install_brew htop
-install_brew imagemagick
-install_brew jq
-install_brew killport
-install_brew lazydocker
-install_brew lazygit
-install_brew pandoc
-install_brew ripgrep
-install_brew sd
-install_brew speedtest-cli
-install_brew subversion
-if not_installed "tsv-pretty"; then
-    log "Installing tsv-utils"
-    brew install rothgar/tap/tsv-utils
-fi
-install_brew unzip
-install_brew util-linux
-install_brew w3m
-install_brew wait4x
-install_brew watchexec
-install_brew websocat
-install_brew zoxide
-
-# linux specific
-if is_linux; then
-    install_apt heaptrack
-    install_apt heaptrack-gui
-    install_brew sysstat
-    install_brew valgrind
+if is_personal; then
+    $PYTHON $(dirname $0)/dotfiles_provision.py --personal
+else
+    $PYTHON $(dirname $0)/dotfiles_provision.py
 fi
+# shell init cache, now that starship, zoxide and completions are installed
+log "Generating cached shell init"
+$DIR_SCRIPTS/shell-init.sh
+reload
 
 # mac specific
-if is_mac; then
-    install_brew mas
-
-    install_brew colima
-    install_brew docker
-    install_brew docker-compose
-
-    if [ ! -L /var/run/docker.sock ]; then
-        log "Configuring Colima docker socket"
-        sudo ln -sfn $HOME/.colima/default/docker.sock /var/run/docker.sock
-    fi
+if is_mac && [ ! -L /var/run/docker.sock ]; then
+    log "Configuring Colima docker socket"
+    sudo ln -sfn $HOME/.colima/default/docker.sock /var/run/docker.sock
 fi
 
-# ------------------------------------------------------------------------------
-# Install programming languages
-# ------------------------------------------------------------------------------
-install_asdf dotnet          10.0.300
-install_asdf golang          1.26.3
-install_asdf gradle          9.5.1
-install_asdf java            openjdk-26.0.1
-install_asdf julia           1.12.6
-install_asdf kotlin          2.3.21
-install_asdf lua             5.5.0
-install_asdf maven           3.9.16
-install_asdf nodejs          26.1.0
-install_asdf powershell-core 7.6.1
-install_asdf python          3.14.5
-install_asdf R               4.6.0
-install_asdf ruby            4.0.4
-install_asdf zig             0.16.0
-
 # ------------------------------------------------------------------------------
 # Install Rust
 # ------------------------------------------------------------------------------
@@ -457,38 +273,6 @@ done
 log "Installing Rust extensions"
 not_installed "cargo-expand" && cargo install --locked cargo-expand
 
-# ------------------------------------------------------------------------------
-# Install VSCode extensions
-# ------------------------------------------------------------------------------
-if not_installed "code" && not_installed "cursor"; then
-    log_skip "VSCode and Cursor not installed, skipping extensions"
-fi
-
-# General
-
-# WSL / SSH
-install_vscode ms-vscode-remote.remote-wsl         # WSL
-install_vscode ms-vscode-remote.remote-ssh         # SSH
-
-# General
-install_vscode dinhani.divider                     # Divider
-install_vscode vscode-icons-team.vscode-icons      # Icons
-install_vscode oderwat.indent-rainbow              # Indent Rainbow
-install_vscode danbackes.lines                     # Lines
-
-# Language / tools
-install_vscode EditorConfig.EditorConfig           # .editorconfig
-install_vscode mechatroner.rainbow-csv             # CSV
-install_vscode golang.Go                           # Go
-install_vscode ZainChen.json                       # JSON
-install_vscode yzhang.markdown-all-in-one          # Markdown
-install_vscode bierner.markdown-mermaid            # Mermaid
-install_vscode ms-vscode.PowerShell                # PowerShell
-install_vscode ms-python.python                    # Python
-install_vscode rust-lang.rust-analyzer             # Rust
-install_vscode tamasfe.even-better-toml            # TOML
-install_vscode redhat.vscode-xml                   # XML
-
 # ------------------------------------------------------------------------------
 # Install pre-compiled tools
 # ------------------------------------------------------------------------------
@@ -0,0 +1,115 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import dotfiles_provision as provision
+
+
+# ------------------------------------------------------------------------------
+# Fake package managers
+# ------------------------------------------------------------------------------
+MANIFEST = """
+[[group]]
+when = ["linux"]
+apt = ["git", "curl", "vim"]
+brew = ["jq", "fd", "rg"]
+asdf = { ruby = "3.3.0", nodejs = "20" }
+vscode = ["Foo.Installed", "foo.missing"]
+"""
+
+class FakeBin:
+    """Stub commands on an otherwise empty PATH, each appending its command line to a log and answering queries with
+    canned output, so provisioning runs offline and its commands can be asserted."""
+
+    def __init__(self, dir: Path):
+        self.dir = dir
+        self.log = dir / "commands.log"
+
+    def add(self, name: str, responses: dict[str, tuple[str, int]] | None = None) -> None:
+        """Stub `name`; `responses` maps a glob over its arguments to (stdout, exit code)."""
+        cases = "".join(f"    {pattern}) printf '%s' '{output}'; exit {code};;\n" for pattern, (output, code) in (responses or {}).items())
+        script = self.dir / name
+        script.write_text(f'#!/bin/sh\necho "{name} $*" >> "{self.log}"\ncase "$*" in\n{cases}esac\nexit 0\n')
+        script.chmod(0o755)
+
+    def commands(self) -> list[str]:
+        # arguments may end with a newline (dpkg-query's format), leaving blank lines
+        return [line for line in self.log.read_text().splitlines() if line] if self.log.exists() else []
+
+class ProvisionTest(unittest.TestCase):
+
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.bin = FakeBin(Path(temp.name))
+        self.manifest = Path(temp.name) / "packages.toml"
+        self.manifest.write_text(MANIFEST)
+        self.bin.add("dpkg-query", {"-W*": ("installed git\nnot-installed curl\n", 0)})
+        self.bin.add("apt-get")
+        self.bin.add("brew", {"list*": ("jq\n", 0)})
+        self.bin.add("asdf", {"list*": ("", 1)})
+        self.bin.add("code", {"--list-extensions": ("foo.installed\n", 0)})
+        environ = mock.patch.dict(os.environ, {"PATH": str(self.bin.dir), "PROVISION_SUDO": ""})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def provision(self, dry_run: bool = False) -> bool:
+        with contextlib.redirect_stderr(io.StringIO()):
+            return provision.provision(provision.load_manifest(self.manifest, {"linux"}), jobs=2, dry_run=dry_run)
+
+    def installs(self) -> list[str]:
+        queries = ("dpkg-query -W", "brew list -1", "asdf list", "code --list-extensions")
+        return [command for command in self.bin.commands() if not command.startswith(queries)]
+
+    def test_installs_missing_packages_in_one_command_per_manager(self):
+        self.assertTrue(self.provision())
+        installs = self.installs()
+        self.assertIn("apt-get install -y curl vim", installs)
+        self.assertIn("brew install fd rg", installs)
+        self.assertEqual(sorted(command for command in installs if command.startswith("brew fetch")), ["brew fetch --retry fd", "brew fetch --retry rg"])
+        self.assertIn("code --install-extension foo.missing", installs)
+        self.assertIn("asdf plugin add ruby", installs)
+        self.assertIn("asdf install nodejs 20", installs)
+        # managers installed by brew go after it
+        self.assertLess(installs.index("apt-get install -y curl vim"), installs.index("brew install fd rg"))
+        self.assertLess(installs.index("brew install fd rg"), installs.index("asdf plugin add ruby"))
+
+    def test_queries_each_manager_once(self):
+        self.provision()
+        commands = self.bin.commands()
+        for query in ("dpkg-query -W", "brew list -1", "asdf list", "code --list-extensions"):
+            self.assertEqual(sum(command.startswith(query) for command in commands), 1, query)
+
+    def test_dry_run_only_queries(self):
+        self.assertTrue(self.provision(dry_run=True))
+        self.assertEqual(self.installs(), [])
+
+    def test_selects_asdf_versions_already_installed(self):
+        self.bin.add("asdf", {"list*": ("nodejs\n  *20\nruby\n  3.3.0\n", 0)})
+        self.assertTrue(self.provision())
+        asdf = [command for command in self.installs() if command.startswith("asdf")]
+        self.assertEqual(asdf, ["asdf set -u ruby 3.3.0", "asdf set -u nodejs 20"])
+
+    def test_brew_fetch_failure_still_installs(self):
+        self.bin.add("brew", {"list*": ("jq\n", 0), "fetch*": ("", 1)})
+        self.assertTrue(self.provision())
+        self.assertIn("brew install fd rg", self.installs())
+
+    def test_failed_install_fails_the_run(self):
+        self.bin.add("apt-get", {"install*": ("", 100)})
+        self.assertFalse(self.provision())
+
+    def test_sudo_prefix_can_be_overridden(self):
+        with mock.patch.dict(os.environ, {"PROVISION_SUDO": "doas -n"}):
+            self.assertEqual(provision._sudo(), ["doas", "-n"])
+        with mock.patch.dict(os.environ, {"PROVISION_SUDO": ""}):
+            self.assertEqual(provision._sudo(), [])
+
+if __name__ == "__main__":
+    unittest.main()